@@ -40,4 +40,5 @@ def example():
 def main():
     example()
 
-main()
+if __name__ == "__main__":
+    main()
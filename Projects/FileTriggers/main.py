@@ -1,34 +1,221 @@
+import re
+from collections import deque
+
+CHUNK_SIZE = 1 << 20  # Bytes read at a time, so memory does not grow with the file
+MAX_LINE = 1 << 20  # Longer lines are skipped by exact and regex triggers, so one huge line cannot fill memory
+MAX_FIND_LITERALS = 100  # Up to this many substring triggers are searched with bytes.find, more with AhoCorasick
+
+
+class LiteralSearch:
+    """
+    Finds every occurrence of a few byte strings with bytes.find, one pass over the text per string.
+    That pass runs in C at hundreds of MB/s, so this is much faster than AhoCorasick for a few strings.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self.keep = max(len(pattern) for pattern in self.patterns) - 1 if self.patterns else 0
+        self.tail = b""  # The end of the previous chunk, for matches that cross into the next one
+
+    def reset(self):
+        self.tail = b""
+
+    def feed(self, chunk, offset):
+        """Scans the next chunk of the stream. Yields (pattern index, start offset, end offset) for every match."""
+        text = self.tail + chunk
+        textOffset = offset - len(self.tail)
+        for index, pattern in enumerate(self.patterns):
+            # Matches that end within the tail were found with the previous chunk
+            position = text.find(pattern, max(0, len(self.tail) - len(pattern) + 1))
+            while position >= 0:
+                yield index, textOffset + position, textOffset + position + len(pattern)
+                position = text.find(pattern, position + 1)
+        self.tail = text[max(0, len(text) - self.keep):] if self.keep else b""
+
+
+class AhoCorasick:
+    """
+    Finds every occurrence of many byte strings in one pass over the text.
+    It steps through the text byte by byte in Python, at a few MB/s, but that speed does not drop with the
+    number of strings, so it beats LiteralSearch once there are more than about MAX_FIND_LITERALS of them.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        # Build the trie of all patterns
+        trie = [{}]
+        self.output = [[]]
+        for index, pattern in enumerate(self.patterns):
+            state = 0
+            for byte in pattern:
+                if byte not in trie[state]:
+                    trie.append({})
+                    self.output.append([])
+                    trie[state][byte] = len(trie) - 1
+                state = trie[state][byte]
+            self.output[state].append(index)
+
+        # Failure links, breadth first so every state's failure state is done before the state itself
+        fail = [0] * len(trie)
+        order = list(trie[0].values())
+        queue = deque(order)
+        while queue:
+            state = queue.popleft()
+            for byte, child in trie[state].items():
+                fallback = fail[state]
+                while fallback and byte not in trie[fallback]:
+                    fallback = fail[fallback]
+                fail[child] = trie[fallback].get(byte, 0)
+                self.output[child] = self.output[child] + self.output[fail[child]]
+                order.append(child)
+                queue.append(child)
+
+        # Fold the failure links into the transitions, so matching is one dict lookup per byte
+        self.goto = [dict(trie[0])] + [None] * (len(trie) - 1)
+        for state in order:
+            self.goto[state] = {**self.goto[fail[state]], **trie[state]}
+        self.state = 0
+
+        # While in the start state, jump straight to the next byte that can start a pattern
+        firstBytes = bytes(sorted(trie[0]))
+        self.skip = re.compile(b"[" + re.escape(firstBytes) + b"]") if firstBytes else None
+
+    def reset(self):
+        self.state = 0
+
+    def feed(self, chunk, offset):
+        """Scans the next chunk of the stream. Yields (pattern index, start offset, end offset) for every match."""
+        if self.skip is None:
+            return
+        goto = self.goto
+        output = self.output
+        state = self.state
+        position = 0
+        length = len(chunk)
+        while position < length:
+            if state == 0:
+                found = self.skip.search(chunk, position)
+                if found is None:
+                    break
+                position = found.start()
+            state = goto[state].get(chunk[position], 0)
+            position += 1
+            if output[state]:
+                end = offset + position
+                for index in output[state]:
+                    yield index, end - len(self.patterns[index]), end
+        self.state = state
+
+
+class TriggerMatcher:
+    """
+    Matches a file against three kinds of triggers at once:
+    exact triggers equal to a whole line, substring triggers anywhere in the file,
+    and regex triggers matched within each line. Lines longer than maxLine bytes are only searched
+    for substring triggers; maxLine is raised to fit the longest exact trigger. Empty substring triggers are ignored.
+    """
+
+    def __init__(self, exact=(), substrings=(), patterns=()):
+        self.exact = {trigger.encode(): trigger for trigger in exact}
+        self.substrings = [trigger for trigger in substrings if trigger]
+        search = LiteralSearch if len(self.substrings) <= MAX_FIND_LITERALS else AhoCorasick
+        self.literals = search(trigger.encode() for trigger in self.substrings) if self.substrings else None
+        compiled = [(re.compile(pattern.encode()), pattern) for pattern in patterns]
+        # One combined search rules out most lines for the regexes that can be joined with "|" unchanged.
+        # Groups would be renumbered or clash by name, and global flags like (?i) would apply to all of them,
+        # so regexes with those are searched on every line by themselves.
+        plainFlags = re.compile(b"").flags
+        self.joined = []  # Searched only on lines the combined search matches
+        self.separate = []  # Searched on every line
+        for pattern, text in compiled:
+            joinable = not pattern.groups and pattern.flags == plainFlags
+            (self.joined if joinable else self.separate).append((pattern, text))
+        self.combined = re.compile(b"|".join(b"(?:" + pattern.pattern + b")" for pattern, _ in self.joined)) \
+            if self.joined else None
+
+    def matchLine(self, line, offset):
+        if line.endswith(b"\r"):
+            line = line[:-1]
+        trigger = self.exact.get(line)
+        if trigger is not None:
+            yield "exact", trigger, offset, offset + len(line)
+        patterns = self.separate
+        if self.combined is not None and self.combined.search(line):
+            patterns = self.joined + patterns
+        for pattern, text in patterns:
+            for found in pattern.finditer(line):
+                yield "regex", text, offset + found.start(), offset + found.end()
+
+    def scan(self, file, chunkSize=CHUNK_SIZE, maxLine=MAX_LINE):
+        """Reads the file in chunks and yields (kind, trigger, start offset, end offset) for every hit."""
+        if self.literals is not None:
+            self.literals.reset()
+        needLines = bool(self.exact) or self.combined is not None or bool(self.separate)
+        maxLine = max([maxLine] + [len(trigger) + 1 for trigger in self.exact])  # + 1 for a "\r" before the newline
+        with open(file, "rb") as f:
+            offset = 0  # Offset of the start of the chunk
+            pending = b""  # The unfinished last line of the previous chunk
+            pendingOffset = 0
+            skipping = False  # The unfinished line is longer than maxLine and is not matched
+            while True:
+                chunk = f.read(chunkSize)
+                if not chunk:
+                    break
+                if self.literals is not None:
+                    for index, start, end in self.literals.feed(chunk, offset):
+                        yield "substring", self.substrings[index], start, end
+                if needLines:
+                    lines = (pending + chunk).split(b"\n")
+                    pending = lines.pop()
+                    lineOffset = pendingOffset
+                    for line in lines:
+                        if skipping:
+                            skipping = False  # The end of the long line
+                        elif len(line) <= maxLine:
+                            yield from self.matchLine(line, lineOffset)
+                        lineOffset += len(line) + 1
+                    pendingOffset = lineOffset
+                    if len(pending) > maxLine:
+                        # Drop what is kept of the long line, but keep counting its bytes for the offsets
+                        skipping = True
+                        pendingOffset += len(pending)
+                        pending = b""
+                offset += len(chunk)
+            if needLines and not skipping:
+                # Like str.split, the text after the last newline is a line even when it is empty
+                yield from self.matchLine(pending, pendingOffset)
+
+
+def findTriggers(file, exact=(), substrings=(), patterns=(), chunkSize=CHUNK_SIZE, maxLine=MAX_LINE):
+    """Returns every hit in the file as (kind, trigger, start offset, end offset), in file order."""
+    matcher = TriggerMatcher(exact, substrings, patterns)
+    return sorted(matcher.scan(file, chunkSize, maxLine), key=lambda hit: (hit[2], hit[3]))
+
+
 def detectTrigger(trig, file):
-    lines = fileReader(file)
-    for line in lines:
-        for t in trig:
-            if t == line:
-                return True
-            else:
-                continue
-    
-    return False
+    matcher = TriggerMatcher(exact=trig)
+    for _ in matcher.scan(file):
+        return True
 
+    return False
 
-def fileReader(file):
-    with open(file) as f:
-        return f.read().split("\n")
 
 def example():
     triggers = []
 
     filePath = input("Enter File Path: ")
-    
+
     while True:
         t = input("Enter Trigger ( Press Enter to complete ): ")
         if t == "":
             break
         else:
             triggers.append(t)
-    
+
     print(detectTrigger(triggers, filePath))
 
 def main():
     example()
 
-main()
+if __name__ == "__main__":
+    main()
@@ -8,9 +8,6 @@ from urllib.parse import urlparse, parse_qs
 
 API_KEY = ""
 
-# Playlist URL
-playlist_url = input('Enter Playlist URL')
-
 def get_playlist_id(playlist_url):
     parsed_url = urlparse(playlist_url)
     query_params = parse_qs(parsed_url.query)
@@ -73,6 +70,8 @@ def parse_duration(duration):
     return timedelta(hours=hours, minutes=minutes, seconds=seconds)
 
 def main():
+    # Playlist URL
+    playlist_url = input('Enter Playlist URL')
     playlist_id = get_playlist_id(playlist_url)
     if not playlist_id:
         print("Invalid playlist URL. Please try again.")
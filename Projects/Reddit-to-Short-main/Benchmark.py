@@ -0,0 +1,246 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from moviepy.config import get_setting
+
+import config
+import EditVideo
+
+try:
+    import resource
+except ImportError:  # Windows has no resource module, so peak memory is not measured there
+    resource = None
+
+FRAME_RATE = 30  # Frame rate of the synthetic clips
+
+# Source clips as (name, width, height). They cover the usual shapes of Reddit videos.
+SOURCES = [
+    ('landscape_1080p', 1920, 1080),
+    ('landscape_720p', 1280, 720),
+    ('classic_480p', 640, 480),
+    ('square_720', 720, 720),
+    ('portrait_1080p', 1080, 1920)  # Already fits the output, so it measures the linking fast path
+]
+DURATIONS = [5, 20]  # Clip lengths in seconds
+QUICK_SOURCES = ['landscape_720p', 'square_720']
+QUICK_DURATIONS = [5]
+
+
+def make_clip(directory, name, width, height, duration):
+    """
+    Creates a synthetic clip with moving test patterns and a tone, unless it already exists.
+
+    Args:
+        directory (str): The folder the clip is written to.
+        name (str): The name of the source shape.
+        width (int): The clip width.
+        height (int): The clip height.
+        duration (int): The clip length in seconds.
+
+    Returns:
+        str: The clip's file name inside directory.
+    """
+    clip_name = f"{name}_{duration}s.mp4"
+    path = os.path.join(directory, clip_name)
+    if os.path.exists(path):
+        return clip_name
+    command = [
+        get_setting("FFMPEG_BINARY"), '-y', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', f"testsrc2=size={width}x{height}:rate={FRAME_RATE}:duration={duration}",
+        '-f', 'lavfi', '-i', f"sine=frequency=440:duration={duration}",
+        '-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p', '-c:a', 'aac', '-shortest',
+        f"{path}.partial.mp4"
+    ]
+    subprocess.run(command, check=True)
+    os.replace(f"{path}.partial.mp4", path)
+    return clip_name
+
+
+def peak_rss_mb():
+    """
+    Returns the peak resident memory of this process and the processes it waited for (such as ffmpeg).
+
+    Returns:
+        float or None: The peak in MiB, or None where it cannot be measured.
+    """
+    if resource is None:
+        return None
+    unit = 1 if sys.platform == 'darwin' else 1024  # ru_maxrss is in bytes on macOS, KiB on Linux
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return round(peak * unit / 1024 ** 2, 1)
+
+
+def run_case(case, results):
+    """
+    Renders one case and puts its measurements on the results queue. It runs in a fresh process,
+    so the peak memory belongs to this case alone.
+
+    Args:
+        case (dict): The case, as built by build_cases.
+        results (multiprocessing.Queue): Where the measurements are put.
+    """
+    config.video['blur'] = case['blur']
+    config.metrics['jsonl_file'] = None  # Keep benchmark renders out of the pipeline's metrics
+    output_name = f"{case['name']}.mp4"
+    output_path = os.path.join(case['directory'], output_name)
+    if os.path.exists(output_path):
+        os.remove(output_path)
+    render = EditVideo.Render(case['directory'], case['clip_name'], output_name, tuple(case['resolution']),
+                              size=(case['width'], case['height']), backend=case['backend'])
+    start_time = time.perf_counter()
+    success = render.render
+    elapsed = time.perf_counter() - start_time
+    frames = case['duration'] * FRAME_RATE
+    results.put({
+        'success': success,
+        'wall_seconds': round(elapsed, 3),
+        'fps': round(frames / elapsed, 1) if success and elapsed else None,
+        'peak_rss_mb': peak_rss_mb(),
+        'output_bytes': os.path.getsize(output_path) if success and os.path.exists(output_path) else None
+    })
+
+
+def build_cases(directory, sources, durations, backends, resolution):
+    """
+    Builds every combination of source shape, duration, backend and blur, creating the clips they need.
+
+    Args:
+        directory (str): The folder for the clips and renders.
+        sources (list): The (name, width, height) of each source shape.
+        durations (list): The clip lengths in seconds.
+        backends (list): The render backends.
+        resolution (tuple): The output resolution.
+
+    Returns:
+        list: One dict per case.
+    """
+    cases = []
+    for source, width, height in sources:
+        for duration in durations:
+            clip_name = make_clip(directory, source, width, height, duration)
+            for backend in backends:
+                for blur in (False, True):
+                    cases.append({
+                        'name': f"{source}_{duration}s_{backend}_{'blur' if blur else 'noblur'}",
+                        'source': source, 'width': width, 'height': height, 'duration': duration,
+                        'backend': backend, 'blur': blur, 'clip_name': clip_name,
+                        'directory': directory, 'resolution': list(resolution)
+                    })
+    return cases
+
+
+def run_benchmark(cases, repeat=1):
+    """
+    Runs every case, each repetition in its own process, and keeps the fastest repetition.
+
+    Args:
+        cases (list): The cases, as built by build_cases.
+        repeat (int): How many times each case is run.
+
+    Returns:
+        list: The measurements of each case.
+    """
+    context = multiprocessing.get_context('spawn')  # A clean interpreter per run, as on Windows
+    results = []
+    for case in cases:
+        runs = []
+        for _ in range(repeat):
+            queue = context.Queue()
+            process = context.Process(target=run_case, args=(case, queue))
+            process.start()
+            process.join()
+            runs.append(queue.get() if process.exitcode == 0 else {'success': False, 'wall_seconds': None})
+        successful = [run for run in runs if run['success']]
+        best = min(successful, key=lambda run: run['wall_seconds']) if successful else runs[-1]
+        result = {key: case[key] for key in ('name', 'source', 'width', 'height', 'duration', 'backend', 'blur')}
+        result.update(best)
+        results.append(result)
+        wall = f"{best['wall_seconds']:.2f}s" if best.get('wall_seconds') is not None else 'failed'
+        print(f"{case['name']:<45} {wall:>9} {best.get('fps') or '-':>8} fps "
+              f"{best.get('peak_rss_mb') or '-':>8} MiB {best.get('output_bytes') or '-':>10} bytes")
+    return results
+
+
+def compare(baseline, results, threshold):
+    """
+    Compares results with a saved baseline, case by case.
+
+    Args:
+        baseline (dict): A report saved by an earlier run.
+        results (list): The measurements of this run.
+        threshold (float): The relative slowdown, e.g. 0.1, above which a case counts as a regression.
+
+    Returns:
+        list: The names of the cases that regressed.
+    """
+    previous = {result['name']: result for result in baseline['results']}
+    regressions = []
+    print(f"\n{'case':<45} {'baseline':>9} {'now':>9} {'change':>8}")
+    for result in results:
+        before = previous.get(result['name'])
+        if not before or not before.get('wall_seconds') or not result.get('wall_seconds'):
+            continue
+        change = result['wall_seconds'] / before['wall_seconds'] - 1
+        marker = ' REGRESSION' if change > threshold else ''
+        print(f"{result['name']:<45} {before['wall_seconds']:>8.2f}s {result['wall_seconds']:>8.2f}s "
+              f"{change:>+8.1%}{marker}")
+        if change > threshold:
+            regressions.append(result['name'])
+    return regressions
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Benchmark EditVideo.Render on synthetic clips, without Reddit.")
+    parser.add_argument('--output', default='benchmark.json', help="JSON file the results are written to")
+    parser.add_argument('--compare', metavar='BASELINE', help="JSON file of an earlier run to compare against")
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help="Slowdown (0.1 = 10%%) above which a case counts as a regression")
+    parser.add_argument('--backends', nargs='+', default=['ffmpeg'], choices=['ffmpeg', 'stream', 'moviepy'])
+    parser.add_argument('--repeat', type=int, default=1, help="Runs per case. The fastest run is kept.")
+    parser.add_argument('--quick', action='store_true', help="Only a few short clips")
+    parser.add_argument('--directory', default=os.path.join('output', 'benchmark'),
+                        help="Folder for the synthetic clips and renders")
+    return parser.parse_args()
+
+
+def main():
+    arguments = parse_arguments()
+    os.makedirs(arguments.directory, exist_ok=True)
+    sources = [source for source in SOURCES if not arguments.quick or source[0] in QUICK_SOURCES]
+    durations = QUICK_DURATIONS if arguments.quick else DURATIONS
+    resolution = config.video['dimensions'] or (1080, 1920)
+    cases = build_cases(arguments.directory, sources, durations, arguments.backends, resolution)
+    print(f"Running {len(cases)} cases at {resolution[0]}x{resolution[1]}...")
+    results = run_benchmark(cases, repeat=arguments.repeat)
+
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'machine': {'platform': platform.platform(), 'python': platform.python_version(),
+                    'cpus': os.cpu_count()},
+        'settings': {'resolution': list(resolution), 'preset': config.video.get('preset'),
+                     'crf': config.video.get('crf'), 'repeat': arguments.repeat},
+        'results': results
+    }
+    with open(arguments.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {arguments.output}")
+
+    if arguments.compare:
+        with open(arguments.compare, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, arguments.threshold)
+        if regressions:
+            print(f"{len(regressions)} cases are more than {arguments.threshold:.0%} slower than the baseline.")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
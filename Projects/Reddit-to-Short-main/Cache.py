@@ -0,0 +1,133 @@
+import hashlib
+import json
+import logging
+import os
+
+import config
+import Folders
+
+
+def file_hash(path, block_size=1024 * 1024):
+    """
+    Computes the SHA-256 of a file without reading it into memory at once.
+
+    Args:
+        path (str): The path to the file.
+        block_size (int): The number of bytes read at a time.
+
+    Returns:
+        str: The hex digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class RenderCache:
+    """
+    Keeps rendered clips under a key made from the source clip's content and the render settings,
+    so a clip that was already rendered with the same settings is never rendered again.
+    The least recently used renders are deleted once the cache is bigger than its size limit.
+    """
+
+    def __init__(self, directory, max_bytes):
+        """
+        Initializes the RenderCache and creates its folder.
+
+        Args:
+            directory (str): The folder the cached renders are kept in.
+            max_bytes (int): The maximum total size of the cached renders.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(source_path, resolution):
+        """
+        Builds the cache key of a render.
+
+        Args:
+            source_path (str): The path to the downloaded clip.
+            resolution (tuple): The resolution the clip is rendered to.
+
+        Returns:
+            str: The key, a hex digest.
+        """
+        settings = {name: value for name, value in config.video.items() if name != 'max_duration'}
+        settings['resolution'] = resolution
+        digest = hashlib.sha256(file_hash(source_path).encode())
+        digest.update(json.dumps(settings, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def path(self, key):
+        """Returns the path a render with the given key is cached at."""
+        return os.path.join(self.directory, f"{key}.mp4")
+
+    def get(self, key, destination):
+        """
+        Places the cached render with the given key at destination, if there is one.
+
+        Args:
+            key (str): The cache key.
+            destination (str): Where the render should be placed.
+
+        Returns:
+            bool: True if the render was cached, False otherwise.
+        """
+        cached = self.path(key)
+        try:
+            os.utime(cached)  # Mark as recently used
+            Folders.link_or_copy(cached, destination)
+        except FileNotFoundError:
+            return False
+        logging.info(f"Reused cached render {key[:12]} for {destination}")
+        return True
+
+    def put(self, key, source):
+        """
+        Adds a render to the cache, then deletes the least recently used renders while the cache is too big.
+
+        Args:
+            key (str): The cache key.
+            source (str): The rendered file. It is linked or copied, not moved.
+        """
+        temporary_path = f"{self.path(key)}.{os.getpid()}.tmp"
+        Folders.link_or_copy(source, temporary_path)
+        os.replace(temporary_path, self.path(key))
+        self.evict()
+
+    def evict(self):
+        """Deletes the least recently used renders until the cache fits in max_bytes."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.mp4'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:  # Deleted by another worker
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                logging.debug(f"Evicted cached render {path}")
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def render_cache():
+    """
+    Returns the render cache configured in config.cache.
+
+    Returns:
+        RenderCache or None: The cache, or None if caching is turned off.
+    """
+    if not config.cache.get('enabled', False):
+        return None
+    return RenderCache(config.cache['directory'], config.cache['max_bytes'])
@@ -0,0 +1,240 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import config
+
+debug = config.debug
+
+# The stages a job goes through. A job is recorded once it has finished the stage.
+DISCOVERED = 'discovered'
+DOWNLOADED = 'downloaded'
+RENDERED = 'rendered'
+UPLOADED = 'uploaded'
+STAGES = [DISCOVERED, DOWNLOADED, RENDERED, UPLOADED]  # In the order a job goes through them
+
+
+def debug_print(message, level="INFO"):
+    if debug:
+        print(f"[{level}] {message}")
+
+
+def connect(path):
+    """
+    Opens a SQLite database that can be shared between threads and survives crashes.
+
+    Args:
+        path (str): The path to the database file.
+
+    Returns:
+        sqlite3.Connection: The open connection.
+    """
+    connection = sqlite3.connect(path, check_same_thread=False)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=FULL')
+    return connection
+
+
+class DedupStore:
+    """Remembers which posts were already uploaded or rejected, so they are never processed twice."""
+
+    def __init__(self, path, legacy_path=None):
+        """
+        Opens the store and loads every known URL into memory for O(1) lookups.
+
+        Args:
+            path (str): The path to the SQLite database file.
+            legacy_path (str): The old comma-separated database.txt. Its URLs are imported once.
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = connect(path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS uploaded (url TEXT PRIMARY KEY, added REAL NOT NULL)')
+        columns = [row[1] for row in self.connection.execute('PRAGMA table_info(uploaded)')]
+        if 'reason' not in columns:  # Stores created before posts could be rejected
+            self.connection.execute("ALTER TABLE uploaded ADD COLUMN reason TEXT NOT NULL DEFAULT 'uploaded'")
+        self.connection.commit()
+        if legacy_path:
+            self._migrate(legacy_path)
+        self.urls = {row[0] for row in self.connection.execute('SELECT url FROM uploaded')}
+        debug_print(f"Loaded {len(self.urls)} URLs from {path}")
+
+    def __contains__(self, url):
+        return url in self.urls
+
+    def __len__(self):
+        return len(self.urls)
+
+    def add(self, url, reason='uploaded'):
+        """
+        Records a URL. The insert is committed before this returns, so it survives a crash right after.
+
+        Args:
+            url (str): The URL of the post.
+            reason (str): Why the post is never processed again: 'uploaded', or why it was rejected,
+                e.g. 'near_duplicate'.
+        """
+        with self.lock:
+            with self.connection:
+                self.connection.execute('INSERT OR IGNORE INTO uploaded (url, added, reason) VALUES (?, ?, ?)',
+                                        (url, time.time(), reason))
+            self.urls.add(url)
+
+    def close(self):
+        """Closes the database connection."""
+        with self.lock:
+            self.connection.close()
+
+    def _migrate(self, legacy_path):
+        """
+        Imports the URLs of the old comma-separated text database once. The file is left in place;
+        the import is recorded in the migrations table instead, so it is not repeated.
+
+        Args:
+            legacy_path (str): The path to the old database file.
+        """
+        if not os.path.exists(legacy_path):
+            return
+        self.connection.execute('CREATE TABLE IF NOT EXISTS migrations (name TEXT PRIMARY KEY, applied REAL NOT NULL)')
+        name = f"legacy:{os.path.basename(legacy_path)}"
+        if self.connection.execute('SELECT 1 FROM migrations WHERE name = ?', (name,)).fetchone():
+            return
+        with open(legacy_path, 'r') as f:
+            urls = [url.strip() for url in f.read().split(',') if url.strip()]
+        now = time.time()
+        with self.connection:
+            self.connection.executemany('INSERT OR IGNORE INTO uploaded (url, added) VALUES (?, ?)',
+                                        [(url, now) for url in urls])
+            self.connection.execute('INSERT INTO migrations (name, applied) VALUES (?, ?)', (name, now))
+        print(f"Migrated {len(urls)} URLs from {legacy_path} to {self.path}.")
+
+
+class JobLedger:
+    """Records how far each job got, so a restarted run can continue where the last one stopped."""
+
+    def __init__(self, path):
+        """
+        Opens the ledger.
+
+        Args:
+            path (str): The path to the SQLite database file.
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = connect(path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS jobs ('
+                                'url TEXT PRIMARY KEY, stage TEXT NOT NULL, info TEXT NOT NULL, updated REAL NOT NULL)')
+        self.connection.commit()
+
+    def discover(self, job):
+        """
+        Adds a new job in the discovered stage.
+
+        Args:
+            job (dict): The post information. Only plain values (str, int, float, list, None) are stored.
+
+        Returns:
+            bool: True if the job is new, False if the ledger already knows its URL.
+        """
+        with self.lock:
+            with self.connection:
+                cursor = self.connection.execute(
+                    'INSERT OR IGNORE INTO jobs (url, stage, info, updated) VALUES (?, ?, ?, ?)',
+                    (job['url'], DISCOVERED, self._info(job), time.time()))
+            return cursor.rowcount == 1
+
+    def record(self, job, stage):
+        """
+        Records that a job has finished a stage. The change is committed before this returns.
+        A job never moves back: if it already reached a later stage, e.g. a resumed job whose render
+        is reused, that stage is kept.
+
+        Args:
+            job (dict): The job.
+            stage (str): The stage the job has finished.
+        """
+        with self.lock:
+            row = self.connection.execute('SELECT stage FROM jobs WHERE url = ?', (job['url'],)).fetchone()
+            if row is not None and row[0] in STAGES and STAGES.index(row[0]) > STAGES.index(stage):
+                stage = row[0]
+            with self.connection:
+                self.connection.execute(
+                    'INSERT OR REPLACE INTO jobs (url, stage, info, updated) VALUES (?, ?, ?, ?)',
+                    (job['url'], stage, self._info(job), time.time()))
+        debug_print(f"{job['url']} is {stage}")
+
+    def forget(self, url):
+        """
+        Removes a job that was dropped, so the post can be picked up again if it shows up in a later listing.
+
+        Args:
+            url (str): The URL of the job.
+        """
+        with self.lock:
+            with self.connection:
+                self.connection.execute('DELETE FROM jobs WHERE url = ?', (url,))
+
+    def unfinished(self):
+        """
+        Returns the jobs that were started but not uploaded, oldest first.
+
+        Returns:
+            list: The jobs, each with a 'stage' key holding the last stage it finished.
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                'SELECT stage, info FROM jobs WHERE stage != ? ORDER BY updated', (UPLOADED,)).fetchall()
+        jobs = []
+        for stage, info in rows:
+            job = json.loads(info)
+            job['stage'] = stage
+            jobs.append(job)
+        return jobs
+
+    def close(self):
+        """Closes the database connection."""
+        with self.lock:
+            self.connection.close()
+
+    @staticmethod
+    def _info(job):
+        return json.dumps({key: value for key, value in job.items()
+                           if key != 'stage' and isinstance(value, (str, int, float, list, type(None)))})
+
+
+_dedup_store = None
+_dedup_store_lock = threading.Lock()
+
+
+def dedup_store():
+    """
+    Returns the shared DedupStore for config.database, opening it on first use.
+
+    Returns:
+        DedupStore: The store of uploaded post URLs.
+    """
+    global _dedup_store
+    with _dedup_store_lock:
+        if _dedup_store is None:
+            _dedup_store = DedupStore(config.database, legacy_path=config.legacy_database)
+        return _dedup_store
+
+
+_job_ledger = None
+_job_ledger_lock = threading.Lock()
+
+
+def job_ledger():
+    """
+    Returns the shared JobLedger for config.database, opening it on first use.
+
+    Returns:
+        JobLedger: The ledger of started jobs.
+    """
+    global _job_ledger
+    with _job_ledger_lock:
+        if _job_ledger is None:
+            _job_ledger = JobLedger(config.database)
+        return _job_ledger
@@ -1,12 +1,203 @@
 import os
-import shutil
 import logging
+import signal
+import subprocess
+import tempfile
+import time
+from functools import lru_cache
+import numpy as np
+from moviepy.config import get_setting
 from moviepy.editor import VideoFileClip, CompositeVideoClip, vfx
-from skimage.filters import gaussian
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
 import config
+import Folders
+import Metrics
 
 debug = config.debug
 
+BLUR_SIGMA = 25  # Gaussian sigma of the background blur, in output pixels
+BLUR_SCALE = 8  # The background is blurred at 1/BLUR_SCALE of its size
+BLUR_PASSES = 3  # Three box blurs in a row are close to a Gaussian
+
+
+def downscale(image, factor):
+    """
+    Shrinks an image by averaging each factor x factor block of pixels.
+
+    Args:
+        image (ndarray): The image as a (height, width, channels) uint8 array.
+        factor (int): How many times smaller the result is on each side.
+
+    Returns:
+        ndarray: The shrunk image as float32.
+    """
+    height, width = image.shape[:2]
+    rows = np.arange(0, height, factor)
+    cols = np.arange(0, width, factor)
+    summed = np.add.reduceat(np.add.reduceat(image, rows, axis=0, dtype=np.uint32), cols, axis=1)
+    counts = np.minimum(factor, height - rows)[:, None] * np.minimum(factor, width - cols)[None, :]
+    return (summed / counts[..., None]).astype(np.float32)
+
+
+@lru_cache(maxsize=8)
+def interpolation_matrix(size, small_size):
+    """
+    Builds the matrix that linearly interpolates small_size samples up to size samples.
+
+    Args:
+        size (int): The number of output samples.
+        small_size (int): The number of input samples.
+
+    Returns:
+        ndarray: A (size, small_size) float32 matrix whose rows each sum to 1.
+    """
+    points = np.clip((np.arange(size) + 0.5) * small_size / size - 0.5, 0, small_size - 1)
+    lower = points.astype(np.intp)
+    upper = np.minimum(lower + 1, small_size - 1)
+    weights = (points - lower).astype(np.float32)
+    matrix = np.zeros((size, small_size), dtype=np.float32)
+    np.add.at(matrix, (np.arange(size), lower), 1 - weights)
+    np.add.at(matrix, (np.arange(size), upper), weights)
+    matrix.flags.writeable = False
+    return matrix
+
+
+def upscale(image, height, width):
+    """
+    Stretches an image to the given size with bilinear interpolation, done as two matrix products.
+
+    Args:
+        image (ndarray): The image as a (height, width, channels) float array with values in 0-255.
+        height (int): The height of the result.
+        width (int): The width of the result.
+
+    Returns:
+        ndarray: The stretched image as uint8.
+    """
+    rows = interpolation_matrix(height, image.shape[0])
+    cols = interpolation_matrix(width, image.shape[1])
+    channels = np.ascontiguousarray(image.transpose(2, 0, 1)) + 0.5  # + 0.5 so the uint8 cast rounds
+    return (rows @ channels @ cols.T).transpose(1, 2, 0).astype(np.uint8)
+
+
+def box_blur(image, radius, axis):
+    """
+    Averages every pixel with its radius neighbours along one axis, using a running sum.
+    Pixels past the edge repeat the edge pixel.
+
+    Args:
+        image (ndarray): The image as a float32 array.
+        radius (int): The number of neighbours on each side.
+        axis (int): The axis to blur along.
+
+    Returns:
+        ndarray: The blurred image.
+    """
+    padding = [(0, 0)] * image.ndim
+    padding[axis] = (radius + 1, radius)
+    running = np.cumsum(np.pad(image, padding, mode='edge'), axis=axis, dtype=np.float32)
+    size = image.shape[axis]
+    window = 2 * radius + 1
+    upper = np.take(running, np.arange(window, window + size), axis=axis)
+    lower = np.take(running, np.arange(size), axis=axis)
+    return (upper - lower) / window
+
+
+def blur_radius():
+    """Returns the box blur radius that, applied BLUR_PASSES times at 1/BLUR_SCALE size, matches BLUR_SIGMA."""
+    sigma = BLUR_SIGMA / BLUR_SCALE
+    return max(1, round(((12 * sigma ** 2 / BLUR_PASSES + 1) ** 0.5 - 1) / 2))
+
+
+def read_frame(stream, buffer):
+    """
+    Fills a buffer with the next raw frame from a pipe, without allocating.
+
+    Args:
+        stream: The binary pipe to read from.
+        buffer (memoryview): The bytes of one frame.
+
+    Returns:
+        bool: True if a whole frame was read, False at the end of the stream.
+    """
+    filled = 0
+    while filled < len(buffer):
+        count = stream.readinto(buffer[filled:])
+        if not count:
+            return False
+        filled += count
+    return True
+
+
+class StreamCompositor:
+    """
+    Builds output frames from decoded frames in buffers that are allocated once, so memory use does not
+    grow with the clip length or the number of frames.
+
+    The decoder delivers each frame as the background on top of the foreground, both already scaled by
+    ffmpeg. When blurring, the background arrives at 1/BLUR_SCALE size, is blurred at that size and is
+    stretched to the output size with the interpolation matrices.
+    """
+
+    def __init__(self, resolution, foreground_height, blur):
+        """
+        Allocates the buffers.
+
+        Args:
+            resolution (tuple): The (width, height) of the output.
+            foreground_height (int): The height of the foreground scaled to the output width.
+            blur (bool): Whether the background is blurred.
+        """
+        self.width, self.height = resolution
+        self.foreground_height = foreground_height
+        self.blur = blur
+        if blur:
+            self.background_width = -(-self.width // BLUR_SCALE)
+            self.background_height = -(-self.height // BLUR_SCALE)
+            self.rows = interpolation_matrix(self.height, self.background_height)
+            self.columns = interpolation_matrix(self.width, self.background_width).T.copy()
+            self.small = np.empty((3, self.background_height, self.background_width), dtype=np.float32)
+            self.stretched_rows = np.empty((self.background_height, self.width), dtype=np.float32)
+            self.channel = np.empty((self.height, self.width), dtype=np.float32)
+        else:
+            self.background_height = self.height
+            self.darkened = np.empty((self.height, self.width, 3), dtype=np.uint16)
+        # The decoded frame: the background rows (padded to the output width) on top of the foreground rows
+        self.decoded = np.empty((self.background_height + foreground_height, self.width, 3), dtype=np.uint8)
+        self.decoded_bytes = memoryview(self.decoded).cast('B')
+        self.frame = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        top = (self.height - foreground_height) // 2
+        # A foreground taller than the output is cropped to its middle
+        self.target = slice(max(top, 0), max(top, 0) + min(foreground_height, self.height))
+        self.source = slice(max(-top, 0), max(-top, 0) + min(foreground_height, self.height))
+
+    def composite(self):
+        """
+        Builds the output frame from the decoded frame.
+
+        Returns:
+            ndarray: The output frame. The same array is reused for every frame.
+        """
+        background = self.decoded[:self.background_height]
+        if self.blur:
+            np.copyto(self.small, background[:, :self.background_width].transpose(2, 0, 1))
+            radius = blur_radius()
+            small = self.small
+            for _ in range(BLUR_PASSES):
+                small = box_blur(box_blur(small, radius, axis=1), radius, axis=2)
+            for channel in range(3):
+                np.matmul(small[channel], self.columns, out=self.stretched_rows)
+                np.matmul(self.rows, self.stretched_rows, out=self.channel)
+                self.channel *= 0.1  # Darken, same as vfx.colorx(0.1)
+                self.channel += 0.5  # So the uint8 cast rounds
+                np.copyto(self.frame[..., channel], self.channel, casting='unsafe')
+        else:
+            np.multiply(background, 26, out=self.darkened)  # Darken by 26 / 256, close to vfx.colorx(0.1)
+            self.darkened >>= 8
+            np.copyto(self.frame, self.darkened, casting='unsafe')
+        np.copyto(self.frame[self.target], self.decoded[self.background_height:][self.source])
+        return self.frame
+
 
 def configure_logging():
     """Configure logging level based on the debug flag."""
@@ -17,7 +208,7 @@ def configure_logging():
 
 
 class Render:
-    def __init__(self, directory, clip_name, output_name, resolution):
+    def __init__(self, directory, clip_name, output_name, resolution, size=None, backend=None):
         """
         Initializes the Render object with directory, clip name, output name, and resolution.
 
@@ -26,24 +217,183 @@ class Render:
             clip_name (str): The name of the input video clip.
             output_name (str): The name of the output video clip.
             resolution (tuple): The desired resolution for the output video.
+            size (tuple): The (width, height) of the input clip if already known, e.g. from the post metadata.
+            backend (str): 'ffmpeg', 'stream' or 'moviepy'. Defaults to config.video['backend'].
         """
         self.directory = directory
         self.clip_name = clip_name
         self.output_name = output_name
         self.resolution = resolution
+        self.size = size
+        self.backend = backend or config.video.get('backend', 'ffmpeg')
 
     @staticmethod
     def blur(image):
         """
-        Applies a Gaussian blur to the image.
+        Applies a Gaussian-like blur to the image.
+
+        The image is shrunk, blurred with repeated box blurs and stretched back. At this sigma the detail
+        lost by shrinking is blurred away anyway, and the blur itself runs on 1/64th of the pixels.
+
+        Args:
+            image (ndarray): The image to be blurred, as a (height, width, channels) uint8 array.
+
+        Returns:
+            ndarray: The blurred image as uint8.
+        """
+        height, width = image.shape[:2]
+        small = downscale(image, BLUR_SCALE)
+        radius = blur_radius()
+        for _ in range(BLUR_PASSES):
+            small = box_blur(box_blur(small, radius, axis=0), radius, axis=1)
+        return upscale(small, height, width)
+
+    def filtergraph(self):
+        """
+        Builds the ffmpeg filtergraph that does the whole edit in one pass: the decoded frames are split
+        into a darkened (and optionally blurred) background stretched to the output size, and a
+        foreground scaled to the output width and overlaid in the center.
+
+        Returns:
+            str: The filtergraph, with the video output labelled [v].
+        """
+        width, height = self.resolution
+        # Same as vfx.colorx(0.1) on RGB, done on the limited range YUV planes to skip a colorspace conversion
+        background = (f"[bg]scale={width}:{height},setsar=1,"
+                      f"lutyuv=y=(val-16)*0.1+16:u=(val-128)*0.1+128:v=(val-128)*0.1+128")
+        if config.video.get('blur', False):
+            background += ",boxblur=24:3"  # Three box passes of radius 24 approximate a Gaussian with sigma 25
+        return ";".join([
+            "[0:v]split=2[bg][fg]",
+            f"{background}[background]",
+            f"[fg]scale={width}:-2,setsar=1[foreground]",
+            "[background][foreground]overlay=(W-w)/2:(H-h)/2,format=yuv420p[v]"
+        ])
+
+    def render_ffmpeg(self, input_path, output_path):
+        """
+        Renders the clip with a single ffmpeg process, so the input is decoded once and encoded once.
+
+        Args:
+            input_path (str): The path to the input clip.
+            output_path (str): The path to write the rendered clip to.
+        """
+        command = [
+            get_setting("FFMPEG_BINARY"), '-y', '-loglevel', 'error',
+            '-i', input_path,
+            '-filter_complex', self.filtergraph(),
+            '-map', '[v]', '-map', '0:a?',
+            '-c:v', 'libx264', '-preset', config.video.get('preset', 'medium'),
+            '-crf', str(config.video.get('crf', 23)),
+            '-c:a', 'aac', '-movflags', '+faststart',
+            output_path
+        ]
+        logging.debug(f"Running: {' '.join(command)}")
+        result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg exited with code {result.returncode}: {result.stderr.strip()[-500:]}")
+
+    def render_stream(self, input_path, output_path):
+        """
+        Renders the clip by streaming raw frames from an ffmpeg decoder, through a StreamCompositor,
+        into an ffmpeg encoder. Only one frame is held at a time, in reused buffers.
+
+        Args:
+            input_path (str): The path to the input clip.
+            output_path (str): The path to write the rendered clip to.
+        """
+        width, height = self.resolution
+        clip_width, clip_height = self.clip_size(input_path)
+        foreground_height = max(2, round(width * clip_height / (clip_width * 2)) * 2)
+        blur = config.video.get('blur', False)
+        compositor = StreamCompositor(self.resolution, foreground_height, blur)
+        with Metrics.metrics().timed('probe'):
+            fps = ffmpeg_parse_infos(input_path).get('video_fps') or 30
+
+        if blur:
+            background = (f"[bg]scale={compositor.background_width}:{compositor.background_height}:flags=area,"
+                          f"setsar=1,pad={width}:ih[background]")
+        else:
+            background = f"[bg]scale={width}:{height},setsar=1[background]"
+        ffmpeg = get_setting("FFMPEG_BINARY")
+        decode_command = [
+            ffmpeg, '-loglevel', 'error', '-i', input_path,
+            '-filter_complex', ";".join([
+                "[0:v]split=2[bg][fg]",
+                background,
+                f"[fg]scale={width}:{foreground_height},setsar=1[foreground]",
+                "[background][foreground]vstack,format=rgb24[v]"
+            ]),
+            '-map', '[v]', '-r', str(fps), '-f', 'rawvideo', '-'
+        ]
+        encode_command = [
+            ffmpeg, '-y', '-loglevel', 'error',
+            '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f"{width}x{height}", '-r', str(fps), '-i', '-',
+            '-i', input_path,
+            '-map', '0:v', '-map', '1:a?',
+            '-c:v', 'libx264', '-preset', config.video.get('preset', 'medium'),
+            '-crf', str(config.video.get('crf', 23)), '-pix_fmt', 'yuv420p',
+            '-c:a', 'aac', '-shortest', '-movflags', '+faststart',
+            output_path
+        ]
+        logging.debug(f"Running: {' '.join(decode_command)} | {' '.join(encode_command)}")
+        # stderr goes to files, so a chatty ffmpeg cannot fill a pipe and stall
+        with tempfile.TemporaryFile() as decode_errors, tempfile.TemporaryFile() as encode_errors:
+            decoder = subprocess.Popen(decode_command, stdout=subprocess.PIPE, stderr=decode_errors)
+            encoder = subprocess.Popen(encode_command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                       stderr=encode_errors)
+            frames = 0
+            try:
+                while read_frame(decoder.stdout, compositor.decoded_bytes):
+                    encoder.stdin.write(compositor.composite())
+                    frames += 1
+            finally:
+                decoder.stdout.close()
+                try:
+                    encoder.stdin.close()
+                except BrokenPipeError:
+                    pass
+                decoder.wait()
+                encoder.wait()
+            for name, process, errors in (('decoder', decoder, decode_errors), ('encoder', encoder, encode_errors)):
+                if process.returncode != 0:
+                    errors.seek(0)
+                    message = errors.read().decode(errors='replace').strip()[-500:]
+                    raise RuntimeError(f"ffmpeg {name} exited with code {process.returncode}: {message}")
+        logging.debug(f"Streamed {frames} frames")
+
+    def render_moviepy(self, input_path, output_path):
+        """
+        Renders the clip through moviepy, compositing the frames in Python.
+
+        Args:
+            input_path (str): The path to the input clip.
+            output_path (str): The path to write the rendered clip to.
+        """
+        main_clip = VideoFileClip(input_path)
+        bg = VideoFileClip(input_path).resize(self.resolution).fx(vfx.colorx, 0.1)  # Darken background
+        if config.video.get('blur', False):
+            bg = bg.fl_image(self.blur)
+            logging.debug("Applied Gaussian blur to the background.")
+
+        main_clip = main_clip.resize(width=self.resolution[0]).set_start(0)
+        video = CompositeVideoClip([bg, main_clip.set_position("center", "center")])
+        video.write_videofile(output_path, audio_codec='aac')
+
+    def clip_size(self, input_path):
+        """
+        Returns the size of the input clip, probing the file header only if the size was not given.
 
         Args:
-            image (ndarray): The image to be blurred.
+            input_path (str): The path to the input clip.
 
         Returns:
-            ndarray: The blurred image.
+            tuple: The (width, height) of the clip.
         """
-        return gaussian(image.astype(float), sigma=25)
+        if self.size and all(self.size):
+            return tuple(self.size)
+        with Metrics.metrics().timed('probe'):
+            return tuple(ffmpeg_parse_infos(input_path)['video_size'])
 
     @property
     def render(self):
@@ -58,30 +408,30 @@ class Render:
             output_path = os.path.join(self.directory, self.output_name)
 
             if self.resolution is None:
-                logging.debug("No resolution set, copying the input clip to the output.")
-                shutil.copy(input_path, output_path)
+                logging.debug("No resolution set, linking the input clip to the output.")
+                Folders.link_or_copy(input_path, output_path)
                 return True
 
-            main_clip = VideoFileClip(input_path)
-            exact_ratio = main_clip.size[0] / main_clip.size[1]
+            size = self.clip_size(input_path)
+            exact_ratio = size[0] / size[1]
             theoretical_ratio = self.resolution[0] / self.resolution[1]
 
             if theoretical_ratio * 0.95 < exact_ratio < theoretical_ratio * 1.05:
-                logging.debug(f"Clip aspect ratio is close to the theoretical ratio. Copying the clip.\n"
+                logging.debug(f"Clip aspect ratio is close to the theoretical ratio. Linking the clip.\n"
                               f"Exact: {exact_ratio}, Theoretical: {theoretical_ratio}")
-                shutil.copy(input_path, output_path)
+                Folders.link_or_copy(input_path, output_path)
                 return True
 
-            bg = VideoFileClip(input_path).resize(self.resolution).fx(vfx.colorx, 0.1)  # Darken background
-            if config.video.get('blur', False):
-                bg = bg.fl_image(self.blur)
-                logging.debug("Applied Gaussian blur to the background.")
+            start_time = time.perf_counter()
+            if self.backend == 'moviepy':
+                self.render_moviepy(input_path, output_path)
+            elif self.backend == 'stream':
+                self.render_stream(input_path, output_path)
+            else:
+                self.render_ffmpeg(input_path, output_path)
+            elapsed = time.perf_counter() - start_time
 
-            main_clip = main_clip.resize(width=self.resolution[0]).set_start(0)
-            video = CompositeVideoClip([bg, main_clip.set_position("center", "center")])
-            video.write_videofile(output_path, audio_codec='aac')
-
-            logging.info(f"Rendered video saved to {output_path}")
+            logging.info(f"Rendered video saved to {output_path} in {elapsed:.1f}s with the {self.backend} backend")
             return True
         except PermissionError as e:
             logging.error(f"Permission error: {e}")
@@ -90,6 +440,46 @@ class Render:
             logging.error(f"An error occurred during rendering: {e}")
             return False
 
+    def compare_backends(self):
+        """
+        Renders the clip with every backend and logs how their wall-clock times compare with moviepy.
+        Each backend writes to its own file next to the output, so the results can be checked side by side.
+
+        Returns:
+            dict: The wall-clock time in seconds per backend, or None for a backend that failed.
+        """
+        timings = {}
+        name, extension = os.path.splitext(self.output_name)
+        for backend in ('moviepy', 'ffmpeg', 'stream'):
+            render = Render(self.directory, self.clip_name, f"{name}_{backend}{extension}", self.resolution,
+                            size=self.size, backend=backend)
+            start_time = time.perf_counter()
+            success = render.render
+            elapsed = time.perf_counter() - start_time
+            timings[backend] = elapsed if success else None
+        for backend in ('ffmpeg', 'stream'):
+            if timings['moviepy'] and timings[backend]:
+                logging.info(f"moviepy: {timings['moviepy']:.1f}s, {backend}: {timings[backend]:.1f}s "
+                             f"({timings['moviepy'] / timings[backend]:.1f}x faster)")
+        return timings
+
+
+def warm_worker():
+    """
+    Prepares a render process before its first job: sets up logging, finds the ffmpeg binary and,
+    if the background is blurred, builds the interpolation matrices for the output size.
+    Used as the initializer of render process pools, so every job after that starts warm.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C stops the main process, which lets the renders finish
+    configure_logging()
+    get_setting("FFMPEG_BINARY")
+    Metrics.metrics()
+    resolution = config.video.get('dimensions')
+    if resolution and config.video.get('blur', False):
+        width, height = resolution
+        interpolation_matrix(height, -(-height // BLUR_SCALE))
+        interpolation_matrix(width, -(-width // BLUR_SCALE))
+
 
 if __name__ == '__main__':
     # Example usage:
@@ -104,3 +494,6 @@ if __name__ == '__main__':
         logging.info("Rendering completed successfully.")
     else:
         logging.error("Rendering failed.")
+
+    # Compare the ffmpeg filtergraph and streaming backends with the moviepy one on the same clip
+    renderer.compare_backends()
@@ -0,0 +1,248 @@
+import logging
+import os
+import random
+import shutil
+import subprocess
+import threading
+import time
+
+import Folders
+import Reddit
+import Upload
+
+
+class FakeAuthor:
+    def __init__(self, name):
+        self.name = name
+
+
+class FakePost:
+    """A stand-in for praw.models.Submission with the attributes Reddit.GetRedditLink reads."""
+
+    def __init__(self, number, subreddit, created_utc, duration=20, width=1280, height=720):
+        """
+        Initializes the FakePost.
+
+        Args:
+            number (int): Makes the post's URL, title and id unique.
+            subreddit (str): The subreddit the post belongs to.
+            created_utc (float): The post's creation time.
+            duration (float): The video duration in seconds.
+            width (int): The video width.
+            height (int): The video height.
+        """
+        self.url = f"https://v.redd.it/fake{subreddit}{number:06d}"
+        self.title = f"Fake post {number} from r/{subreddit}"
+        self.fullname = f"t3_fake{subreddit}{number:06d}"
+        self.created_utc = created_utc
+        self.author = FakeAuthor(f"user{number % 97}")
+        self.stickied = False
+        self.over_18 = False
+        self.secure_media = {'reddit_video': {'duration': duration, 'width': width, 'height': height}}
+        self.media = self.secure_media
+        self.crosspost_parent_list = []
+
+
+class FakeSubreddit:
+    """A subreddit listing that serves a fixed list of posts, newest first."""
+
+    def __init__(self, posts, latency=0.0):
+        self.posts = sorted(posts, key=lambda post: post.created_utc, reverse=True)
+        self.latency = latency
+
+    def top(self, time_filter="week", limit=None):
+        time.sleep(self.latency)
+        return iter(self.posts[:limit])
+
+    def new(self, limit=None):
+        time.sleep(self.latency)
+        return iter(self.posts[:limit])
+
+
+class FakeReddit:
+    """A stand-in for praw.Reddit. Accepts and ignores the login credentials."""
+
+    def __init__(self, subreddits, **credentials):
+        """
+        Initializes the FakeReddit.
+
+        Args:
+            subreddits (dict): The FakeSubreddit of each subreddit name.
+            credentials: The praw.Reddit keyword arguments. Ignored.
+        """
+        self.subreddits = subreddits
+
+    def subreddit(self, name):
+        if '+' in name:
+            posts = [post for part in name.split('+') for post in self.subreddits[part].posts]
+            return FakeSubreddit(posts, latency=max(self.subreddits[part].latency for part in name.split('+')))
+        return self.subreddits[name]
+
+
+class FakeDownloader:
+    """A stand-in for redvid.Downloader that "downloads" a local clip after a delay."""
+
+    def __init__(self, url, clip_path, duration=20, latency=0.0, failure_rate=0.0, max_q=True):
+        """
+        Initializes the FakeDownloader.
+
+        Args:
+            url (str): The URL of the post.
+            clip_path (str): The local clip every download returns a link or copy of.
+            duration (float): The duration reported to the caller.
+            latency (float): The seconds every download takes.
+            failure_rate (float): The fraction of downloads that fail.
+            max_q (bool): Ignored, accepted like redvid.Downloader.
+        """
+        self.url = url
+        self.clip_path = clip_path
+        self.duration = duration
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.path = None
+
+    def download(self):
+        time.sleep(self.latency)
+        if random.random() < self.failure_rate:
+            raise IOError(f"Simulated download failure: {self.url}")
+        destination = os.path.join(self.path, f"{self.url.rsplit('/', 1)[-1]}.mp4")
+        Folders.link_or_copy(self.clip_path, destination)
+        return destination
+
+
+class FakeUploader:
+    """
+    A stand-in for Upload.YouTubeUploader that keeps every upload in memory.
+
+    It takes latency plus the file size divided by the bandwidth per upload, fails a fraction of uploads,
+    and raises Upload.QuotaExceededError once its quota is spent, like the real API. With a quota_period,
+    the quota resets every that many seconds, at the same moments as a QuotaScheduler with that day_length.
+    """
+
+    def __init__(self, latency=0.0, bandwidth=None, failure_rate=0.0, quota=None, upload_cost=1600,
+                 quota_period=None):
+        """
+        Initializes the FakeUploader.
+
+        Args:
+            latency (float): The seconds every upload takes, on top of the transfer time.
+            bandwidth (float): The bytes per second uploaded, or None for no transfer time.
+            failure_rate (float): The fraction of uploads that fail.
+            quota (int): The quota units available, or None for no limit.
+            upload_cost (int): The quota units one upload costs.
+            quota_period (float): The seconds after which the quota resets, or None if it never does.
+        """
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.failure_rate = failure_rate
+        self.quota = quota
+        self.upload_cost = upload_cost
+        self.quota_period = quota_period
+        self.window = None
+        self.used = 0
+        self.rejected = 0  # Uploads refused with QuotaExceededError
+        self.uploads = []
+        self.lock = threading.Lock()
+
+    def refresh_credentials(self):
+        pass
+
+    def upload(self, file, metadata, progress_callback=None):
+        with self.lock:
+            window = int(time.time() // self.quota_period) if self.quota_period else None
+            if window != self.window:
+                self.window = window
+                self.used = 0
+            if self.quota is not None and self.used + self.upload_cost > self.quota:
+                self.rejected += 1
+                raise Upload.QuotaExceededError('quotaExceeded')
+            self.used += self.upload_cost
+        size = os.path.getsize(file)
+        time.sleep(self.latency + (size / self.bandwidth if self.bandwidth else 0))
+        if random.random() < self.failure_rate:
+            logging.error(f"Simulated upload failure: {file}")
+            return None
+        if progress_callback is not None:
+            progress_callback(1.0)
+        with self.lock:
+            video_id = f"fake{len(self.uploads):06d}"
+            self.uploads.append({'id': video_id, 'title': metadata['title'], 'bytes': size, 'window': window})
+        return {'id': video_id}
+
+
+def make_posts(subreddits, count, duration=20, width=1280, height=720):
+    """
+    Builds synthetic posts spread evenly over the subreddits.
+
+    Args:
+        subreddits (list): The subreddit names.
+        count (int): The total number of posts.
+        duration (float): The video duration of every post.
+        width (int): The video width of every post.
+        height (int): The video height of every post.
+
+    Returns:
+        dict: The list of posts of each subreddit.
+    """
+    now = time.time()
+    posts = {name: [] for name in subreddits}
+    for number in range(count):
+        name = subreddits[number % len(subreddits)]
+        posts[name].append(FakePost(number, name, now - number, duration=duration, width=width, height=height))
+    return posts
+
+
+def install(posts, clip_path, listing_latency=0.0, download_latency=0.0, download_failure_rate=0.0,
+            uploader=None):
+    """
+    Replaces the Reddit client, the video downloader and the YouTube uploader with the fakes.
+
+    Args:
+        posts (dict): The list of FakePost of each subreddit, as returned by make_posts.
+        clip_path (str): The local clip every download returns.
+        listing_latency (float): The seconds every subreddit listing takes.
+        download_latency (float): The seconds every download takes.
+        download_failure_rate (float): The fraction of downloads that fail.
+        uploader (FakeUploader): The uploader to use. Defaults to one without latency or limits.
+
+    Returns:
+        FakeUploader: The installed uploader.
+    """
+    subreddits = {name: FakeSubreddit(subreddit_posts, latency=listing_latency)
+                  for name, subreddit_posts in posts.items()}
+    durations = {post.url: post.secure_media['reddit_video']['duration']
+                 for subreddit_posts in posts.values() for post in subreddit_posts}
+    Reddit.client_factory = lambda **credentials: FakeReddit(subreddits, **credentials)
+    Reddit.downloader_factory = lambda url, max_q=True: FakeDownloader(
+        url, clip_path, duration=durations.get(url, 20), latency=download_latency,
+        failure_rate=download_failure_rate)
+    uploader = uploader or FakeUploader()
+    Upload.set_uploader(uploader)
+    return uploader
+
+
+def make_clip(path, duration=5, width=1280, height=720):
+    """
+    Writes a test-pattern clip with ffmpeg, or a placeholder file if ffmpeg is not installed.
+    The placeholder is enough when the load test does not render.
+
+    Args:
+        path (str): Where the clip is written.
+        duration (int): The clip length in seconds.
+        width (int): The clip width.
+        height (int): The clip height.
+
+    Returns:
+        str: The path.
+    """
+    ffmpeg = shutil.which('ffmpeg')
+    if ffmpeg is None:
+        with open(path, 'wb') as f:
+            f.write(os.urandom(256 * 1024))
+        return path
+    subprocess.run([ffmpeg, '-y', '-loglevel', 'error',
+                    '-f', 'lavfi', '-i', f"testsrc2=size={width}x{height}:rate=30:duration={duration}",
+                    '-f', 'lavfi', '-i', f"sine=frequency=440:duration={duration}",
+                    '-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p', '-c:a', 'aac', '-shortest',
+                    path], check=True)
+    return path
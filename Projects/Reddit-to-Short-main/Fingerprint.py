@@ -0,0 +1,249 @@
+import subprocess
+import threading
+from collections import defaultdict
+
+import numpy as np
+from moviepy.config import get_setting
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+import config
+import Database
+import Metrics
+
+debug = config.debug
+
+HASH_SIZE = 8  # Each frame hash is HASH_SIZE x HASH_SIZE = 64 bits
+SAMPLE_SIZE = 32  # Frames are shrunk to SAMPLE_SIZE x SAMPLE_SIZE grey pixels before hashing
+MIN_FRAME_STD = 4.0  # Frames whose grey levels vary less than this (black, white, fades) are not hashed
+
+
+def debug_print(message, level="INFO"):
+    if debug:
+        print(f"[{level}] {message}")
+
+
+def dct_matrix(size):
+    """
+    Builds the orthonormal DCT-II matrix, so that dct_matrix(n) @ x is the DCT of a length n signal.
+
+    Args:
+        size (int): The signal length.
+
+    Returns:
+        ndarray: A (size, size) float64 matrix.
+    """
+    k = np.arange(size)[:, None]
+    n = np.arange(size)[None, :]
+    matrix = np.sqrt(2 / size) * np.cos(np.pi * (2 * n + 1) * k / (2 * size))
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+DCT = dct_matrix(SAMPLE_SIZE)
+
+
+def frame_hashes(frames):
+    """
+    Computes the perceptual hash (pHash) of every frame at once: the low frequencies of the 2D DCT,
+    each set to 1 if above the median. Small edits such as re-encoding, scaling or watermarks barely change it.
+
+    Args:
+        frames (ndarray): A (count, SAMPLE_SIZE, SAMPLE_SIZE) array of grey frames.
+
+    Returns:
+        list: One 64-bit int per frame.
+    """
+    coefficients = DCT @ frames.astype(np.float64) @ DCT.T
+    low = coefficients[:, :HASH_SIZE, :HASH_SIZE].reshape(len(frames), -1)
+    medians = np.median(low[:, 1:], axis=1, keepdims=True)  # The DC term is left out, it only holds the brightness
+    bits = (low > medians).astype(np.uint64)
+    weights = np.uint64(1) << np.arange(HASH_SIZE * HASH_SIZE, dtype=np.uint64)
+    return [int(value) for value in (bits * weights).sum(axis=1, dtype=np.uint64)]
+
+
+def fingerprint(path, duration=None, frames=5):
+    """
+    Hashes a few frames spread evenly over a clip. ffmpeg decodes the clip and shrinks the sampled
+    frames to tiny grey images, so no full size frame ever reaches Python.
+
+    Flat frames are left out: every black or single-colour frame gets the same hash, so they would make
+    unrelated clips look like duplicates.
+
+    Args:
+        path (str): The path to the clip.
+        duration (float): The clip's duration in seconds, if known.
+        frames (int): The number of frames to sample.
+
+    Returns:
+        list: The hash of each sampled frame that is not flat. Empty if every sampled frame is flat.
+    """
+    if not duration:
+        with Metrics.metrics().timed('probe'):
+            duration = ffmpeg_parse_infos(path)['duration']
+    interval = max(duration, 0.1) / frames
+    command = [
+        get_setting("FFMPEG_BINARY"), '-loglevel', 'error',
+        '-ss', f"{interval / 2:.3f}", '-i', path,  # Sample the middle of each interval, not the (often black) first frame
+        '-vf', f"fps={1 / interval:.6f},scale={SAMPLE_SIZE}:{SAMPLE_SIZE}:flags=area,format=gray",
+        '-frames:v', str(frames), '-f', 'rawvideo', '-'
+    ]
+    with Metrics.metrics().timed('fingerprint'):
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    samples = np.frombuffer(result.stdout, dtype=np.uint8).reshape(-1, SAMPLE_SIZE, SAMPLE_SIZE)
+    samples = samples[samples.reshape(len(samples), -1).std(axis=1) >= MIN_FRAME_STD]
+    return frame_hashes(samples) if len(samples) else []
+
+
+def hamming(a, b):
+    """Returns the number of bits that differ between two hashes."""
+    return bin(a ^ b).count('1')
+
+
+class BKTree:
+    """
+    A BK-tree of 64-bit hashes. Finding every hash within a small Hamming distance visits only a
+    small part of the tree, instead of comparing against every hash.
+    """
+
+    def __init__(self):
+        self.root = None  # Each node is [hash, values, {distance: child}]
+        self.size = 0
+
+    def add(self, value_hash, value):
+        """
+        Adds a hash to the tree.
+
+        Args:
+            value_hash (int): The hash.
+            value: What the hash belongs to, returned by search.
+        """
+        self.size += 1
+        if self.root is None:
+            self.root = [value_hash, [value], {}]
+            return
+        node = self.root
+        while True:
+            distance = hamming(value_hash, node[0])
+            if distance == 0:
+                node[1].append(value)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value_hash, [value], {}]
+                return
+            node = child
+
+    def search(self, value_hash, max_distance):
+        """
+        Finds every hash within max_distance of the given one.
+
+        Args:
+            value_hash (int): The hash to look for.
+            max_distance (int): The largest Hamming distance that counts as a match.
+
+        Returns:
+            list: A (value, distance) pair for every match.
+        """
+        matches = []
+        pending = [self.root] if self.root is not None else []
+        while pending:
+            node = pending.pop()
+            distance = hamming(value_hash, node[0])
+            if distance <= max_distance:
+                matches.extend((value, distance) for value in node[1])
+            # By the triangle inequality, matches can only be under children in this distance range
+            for child_distance, child in node[2].items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    pending.append(child)
+        return matches
+
+
+def to_signed(value):
+    """SQLite integers are signed 64-bit, so hashes with the top bit set are stored as negative numbers."""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def to_unsigned(value):
+    """Turns a hash read back from SQLite into the unsigned 64-bit value."""
+    return value + (1 << 64) if value < 0 else value
+
+
+class NearDuplicateIndex:
+    """The frame hashes of every uploaded clip, to find new clips that are near-duplicates of them."""
+
+    def __init__(self, path, max_distance=10, min_matches=3):
+        """
+        Opens the index and loads every stored hash into a BK-tree.
+
+        Args:
+            path (str): The path to the SQLite database file.
+            max_distance (int): The largest Hamming distance at which two frames count as the same.
+            min_matches (int): The number of matching frames that makes two clips near-duplicates.
+        """
+        self.max_distance = max_distance
+        self.min_matches = min_matches
+        self.lock = threading.Lock()
+        self.connection = Database.connect(path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS fingerprints (url TEXT NOT NULL, hash INTEGER NOT NULL)')
+        self.connection.commit()
+        self.tree = BKTree()
+        for url, value_hash in self.connection.execute('SELECT url, hash FROM fingerprints'):
+            self.tree.add(to_unsigned(value_hash), url)
+        debug_print(f"Loaded {self.tree.size} frame hashes.")
+
+    def find(self, hashes):
+        """
+        Looks for an uploaded clip that is a near-duplicate of the given one.
+
+        Args:
+            hashes (list): The frame hashes of the clip.
+
+        Returns:
+            str or None: The URL of the uploaded near-duplicate, or None if there is none.
+        """
+        matched_frames = defaultdict(set)
+        with self.lock:
+            for index, value_hash in enumerate(hashes):
+                for url, _ in self.tree.search(value_hash, self.max_distance):
+                    matched_frames[url].add(index)
+        needed = min(self.min_matches, len(hashes))
+        for url, frames in matched_frames.items():
+            if needed and len(frames) >= needed:
+                return url
+        return None
+
+    def add(self, url, hashes):
+        """
+        Adds an uploaded clip to the index.
+
+        Args:
+            url (str): The URL of the clip's post.
+            hashes (list): The frame hashes of the clip.
+        """
+        with self.lock:
+            with self.connection:
+                self.connection.executemany('INSERT INTO fingerprints (url, hash) VALUES (?, ?)',
+                                            [(url, to_signed(value_hash)) for value_hash in hashes])
+            for value_hash in hashes:
+                self.tree.add(value_hash, url)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def near_duplicate_index():
+    """
+    Returns the shared NearDuplicateIndex configured in config.fingerprint, opening it on first use.
+
+    Returns:
+        NearDuplicateIndex or None: The index, or None if near-duplicate detection is turned off.
+    """
+    global _index
+    if not config.fingerprint.get('enabled', False):
+        return None
+    with _index_lock:
+        if _index is None:
+            _index = NearDuplicateIndex(config.database, max_distance=config.fingerprint['max_distance'],
+                                        min_matches=config.fingerprint['min_matches'])
+        return _index
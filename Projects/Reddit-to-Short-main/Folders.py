@@ -1,45 +1,131 @@
+import json
 import os
+import re
 import shutil
 
 
+def link_or_copy(source, destination):
+    """
+    Makes destination point at the same data as source: a hard link if possible, a copy otherwise.
+
+    Args:
+        source (str): The existing file.
+        destination (str): The path to create. An existing file there is replaced.
+    """
+    if os.path.exists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:  # Different file systems, or links not supported
+        shutil.copy2(source, destination)
+
+
+def write_json_atomic(path, data):
+    """
+    Saves data as JSON, writing a temporary file first and renaming it over path,
+    so a reader or a crash never sees half a file.
+
+    Args:
+        path (str): The JSON file.
+        data: The JSON serializable data.
+    """
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(temporary_path, path)
+
+
 class FolderManager:
     """A class to manage the creation of necessary folders for video processing."""
 
-    def __init__(self, base_folder='output', reddit_folder='reddit_download', render_folder='render_download', final_folder='final_output'):
+    def __init__(self, base_folder='output', jobs_folder='jobs'):
         """
-        Initializes the FolderManager with paths for base, reddit, render, and final folders.
+        Initializes the FolderManager with paths for the base and jobs folders.
 
         Args:
             base_folder (str): The base folder path where all other folders will be created.
-            reddit_folder (str): The name of the folder for Reddit downloads.
-            render_folder (str): The name of the folder for rendered videos.
-            final_folder (str): The name of the folder for final outputs.
+            jobs_folder (str): The name of the folder holding one workspace per job.
         """
         self.base_folder = base_folder
-        self.reddit_folder_path = os.path.join(self.base_folder, reddit_folder)
-        self.render_folder_path = os.path.join(self.base_folder, render_folder)
-        self.final_folder_path = os.path.join(self.base_folder, final_folder)
+        self.jobs_folder_path = os.path.join(self.base_folder, jobs_folder)
+
+    def create_folders(self, clean=False):
+        """
+        Creates the base and jobs folders by calling the _create_folder method.
+
+        Args:
+            clean (bool): Delete everything already in the folders. By default files are kept,
+                so an interrupted run can reuse its downloads and renders.
+        """
+        self._create_folder(self.base_folder, clean)
+        self._create_folder(self.jobs_folder_path, clean)
 
-    def create_folders(self):
+    def job_workspace(self, key):
         """
-        Creates the base, reddit, render, and final folders by calling the _create_folder method.
+        Returns the workspace of a single job inside the jobs folder.
+
+        Args:
+            key (str): The post URL or id the workspace belongs to.
+
+        Returns:
+            JobWorkspace: The workspace for the job. It is not created on disk until create() is called.
         """
-        self._create_folder(self.base_folder)
-        self._create_folder(self.reddit_folder_path)
-        self._create_folder(self.render_folder_path)
-        self._create_folder(self.final_folder_path)
+        return JobWorkspace(self.jobs_folder_path, key)
 
     @staticmethod
-    def _create_folder(path):
+    def _create_folder(path, clean=False):
         """
-        Creates a folder at the specified path. If the folder exists, it is deleted and recreated.
+        Creates a folder at the specified path if it does not exist yet.
 
         Args:
             path (str): The path where the folder should be created.
+            clean (bool): If the folder exists, delete it and its contents and recreate it.
         """
-        if os.path.exists(path):
+        if clean and os.path.exists(path):
             shutil.rmtree(path)  # Delete the folder and its contents if it exists
-        os.makedirs(path)  # Create the folder
+        os.makedirs(path, exist_ok=True)  # Create the folder
+
+
+class JobWorkspace:
+    """A folder holding every file of one job, so several jobs can run at the same time without overwriting each other."""
+
+    render_input_name = 'render_input.mp4'
+    render_output_name = 'render_output.partial.mp4'
+    final_name = 'FINAL_VIDEO.mp4'
+
+    def __init__(self, jobs_folder, key):
+        """
+        Initializes the JobWorkspace for the given post.
+
+        Args:
+            jobs_folder (str): The folder that holds all job workspaces.
+            key (str): The post URL or id. Only its last path part is used, e.g. the v.redd.it id.
+        """
+        self.job_id = re.sub(r'[^A-Za-z0-9_-]', '_', os.path.basename(key.rstrip('/'))) or 'job'
+        self.path = os.path.join(jobs_folder, self.job_id)
+        self.download_folder = os.path.join(self.path, 'download')
+        self.render_input = os.path.join(self.path, self.render_input_name)
+        self.render_output = os.path.join(self.path, self.render_output_name)
+        self.final_path = os.path.join(self.path, self.final_name)
+
+    def create(self):
+        """Creates empty workspace folders. Files left over from an earlier attempt are removed."""
+        self.cleanup()
+        os.makedirs(self.download_folder)
+
+    def commit(self):
+        """
+        Atomically moves the finished render to its final path, so a half-written file is never uploaded.
+
+        Returns:
+            str: The path to the final video.
+        """
+        os.replace(self.render_output, self.final_path)
+        return self.final_path
+
+    def cleanup(self):
+        """Deletes the workspace and everything in it."""
+        shutil.rmtree(self.path, ignore_errors=True)
 
 
 if __name__ == "__main__":
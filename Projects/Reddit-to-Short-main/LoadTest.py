@@ -0,0 +1,147 @@
+import argparse
+import collections
+import contextlib
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+
+import config
+import Fakes
+import Main
+import Metrics
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Push synthetic posts through Main.main with fake Reddit, "
+                                                 "download and YouTube backends, and report the throughput.")
+    parser.add_argument('--posts', type=int, default=300, help="Number of synthetic posts")
+    parser.add_argument('--subreddits', default='funny+cars', help="'+'-joined subreddit names")
+    parser.add_argument('--clip', help="Local clip every download returns. Defaults to a generated one.")
+    parser.add_argument('--render', action='store_true',
+                        help="Render to config.video['dimensions'] (needs a real clip and FFmpeg)")
+    parser.add_argument('--listing-latency', type=float, default=0.2, help="Seconds per subreddit listing")
+    parser.add_argument('--download-latency', type=float, default=0.05, help="Seconds per download")
+    parser.add_argument('--upload-latency', type=float, default=0.1, help="Seconds per upload")
+    parser.add_argument('--upload-bandwidth', type=float, help="Upload bytes per second. Unlimited by default.")
+    parser.add_argument('--failure-rate', type=float, default=0.0,
+                        help="Fraction of downloads and of uploads that fail")
+    parser.add_argument('--quota', type=int,
+                        help="Uploads YouTube allows per quota period. Unlimited by default. When set, the test fails "
+                             "unless uploads pause once the quota is used up and resume after it resets.")
+    parser.add_argument('--quota-period', type=float, default=5.0,
+                        help="Seconds after which the simulated quota resets (instead of a day)")
+    parser.add_argument('--workdir', help="Folder for the database, workspaces and metrics. Defaults to a temporary one.")
+    parser.add_argument('--output', help="JSON file the report is written to")
+    parser.add_argument('--verbose', action='store_true', help="Show the pipeline's own output")
+    return parser.parse_args()
+
+
+def configure(arguments):
+    """Points every file the pipeline writes into the working folder and turns off what needs real clips."""
+    config.subreddit = arguments.subreddits
+    config.database = 'database.sqlite3'
+    config.legacy_database = None
+    config.polling.update({'mode': 'top', 'limit': arguments.posts, 'cursor_file': 'cursors.json'})
+    config.youtube.update({'daily_quota': None, 'hourly_quota': None, 'quota_file': 'quota.json',
+                           'quota_day_seconds': None})
+    if arguments.quota is not None:
+        # The scheduler allows one upload more than the fake YouTube does, so both ways of pausing are used:
+        # the scheduler's own cap, and the quotaExceeded error of the upload that goes over
+        config.youtube.update({'daily_quota': (arguments.quota + 1) * config.youtube['upload_cost'],
+                               'quota_day_seconds': arguments.quota_period})
+    config.metrics.update({'jsonl_file': os.path.join('output', 'metrics.jsonl'), 'prometheus_port': None})
+    config.fingerprint['enabled'] = False  # Every fake post has the same clip, so all but one would be duplicates
+    config.cache['enabled'] = False  # Same for the render cache
+    if not arguments.render:
+        config.video['dimensions'] = None
+
+
+def check_quota(uploader, quota):
+    """
+    Checks that the uploads paused when the simulated quota was used up and resumed after it reset.
+
+    Args:
+        uploader (Fakes.FakeUploader): The fake uploader of the run.
+        quota (int): The uploads allowed per quota period.
+
+    Returns:
+        bool: True if the quota was respected.
+    """
+    per_window = collections.Counter(upload['window'] for upload in uploader.uploads)
+    checks = [
+        ("YouTube refused an upload over the quota", uploader.rejected > 0),
+        ("no quota period had more uploads than allowed", max(per_window.values(), default=0) <= quota),
+        ("uploads resumed in later quota periods", len(per_window) >= math.ceil(len(uploader.uploads) / quota)),
+    ]
+    print(f"\nQuota: {quota} uploads per period, {len(per_window)} periods used, {uploader.rejected} uploads refused")
+    for description, passed in checks:
+        print(f"  {'ok' if passed else 'FAILED'}: {description}")
+    return all(passed for _, passed in checks)
+
+
+def main():
+    arguments = parse_arguments()
+    clip_path = os.path.abspath(arguments.clip) if arguments.clip else None
+    output_path = os.path.abspath(arguments.output) if arguments.output else None  # Relative to where it was run
+    workdir = arguments.workdir or tempfile.mkdtemp(prefix='loadtest-')
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    configure(arguments)
+    if clip_path is None:
+        clip_path = Fakes.make_clip(os.path.join(workdir, 'clip.mp4'))
+
+    subreddits = [name for name in arguments.subreddits.split('+') if name]
+    posts = Fakes.make_posts(subreddits, arguments.posts)
+    quota = arguments.quota * config.youtube['upload_cost'] if arguments.quota is not None else None
+    uploader = Fakes.install(
+        posts, clip_path,
+        listing_latency=arguments.listing_latency,
+        download_latency=arguments.download_latency,
+        download_failure_rate=arguments.failure_rate,
+        uploader=Fakes.FakeUploader(latency=arguments.upload_latency, bandwidth=arguments.upload_bandwidth,
+                                    failure_rate=arguments.failure_rate, quota=quota,
+                                    upload_cost=config.youtube['upload_cost'], quota_period=arguments.quota_period)
+    )
+
+    print(f"Pushing {arguments.posts} posts through the pipeline in {workdir}...")
+    start_time = time.perf_counter()
+    with contextlib.ExitStack() as stack:
+        if not arguments.verbose:
+            stack.enter_context(contextlib.redirect_stdout(open(os.devnull, 'w')))
+        Main.main()
+    elapsed = time.perf_counter() - start_time
+
+    uploaded = len(uploader.uploads)
+    summary = Metrics.metrics().summary()
+    print(f"Uploaded {uploaded} of {arguments.posts} posts in {elapsed:.1f}s "
+          f"({uploaded / elapsed:.1f} posts/s, {uploaded / elapsed * 60:.0f} posts/min)")
+    print(f"\n{'stage':<12} {'runs':>6} {'failed':>7} {'mean':>8} {'p50':>8} {'p95':>8} {'max':>8} {'bytes':>12}")
+    for stage, stats in sorted(summary.items()):
+        print(f"{stage:<12} {stats['count']:>6} {stats['failures']:>7} {stats['mean_seconds']:>7.3f}s "
+              f"{stats['p50_seconds']:>7.3f}s {stats['p95_seconds']:>7.3f}s {stats['max_seconds']:>7.3f}s "
+              f"{stats['bytes']:>12}")
+
+    quota_ok = True
+    if arguments.quota is not None:
+        quota_ok = check_quota(uploader, arguments.quota)
+
+    if output_path:
+        report = {
+            'posts': arguments.posts, 'uploaded': uploaded, 'wall_seconds': round(elapsed, 3),
+            'posts_per_second': round(uploaded / elapsed, 3), 'pipeline': config.pipeline, 'stages': summary
+        }
+        if arguments.quota is not None:
+            report['quota'] = {'per_period': arguments.quota, 'period_seconds': arguments.quota_period,
+                               'rejected': uploader.rejected, 'passed': quota_ok}
+        with open(output_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {output_path}")
+    if not quota_ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
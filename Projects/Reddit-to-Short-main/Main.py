@@ -1,18 +1,34 @@
-import glob
+import argparse
+import itertools
+import json
 import os
-import shutil
+import signal
+import sys
+import threading
 import time
+from functools import partial
 
-from moviepy.editor import VideoFileClip
-
+import Cache
+import Database
 import EditVideo
+import Fingerprint
 import Folders
+import Metrics
+import Pipeline
 import Reddit
+import Scheduler
 import Upload
 import config
 
 debug = config.debug
 
+# The ledger stage a job reaches when each pipeline stage is done with it
+STAGE_RECORDS = {
+    'download': Database.DOWNLOADED,
+    'render': Database.RENDERED,
+    'upload': Database.UPLOADED
+}
+
 
 def start():
     global debug
@@ -41,7 +57,7 @@ def folder_creator():
     Creates necessary folders for the video processing workflow.
 
     Returns:
-        dict: A dictionary containing paths to the base, reddit, render, and final folders.
+        dict: A dictionary containing paths to the base and jobs folders.
     """
     create_folder = Folders.FolderManager()
     debug_print(f"Creating folders: {create_folder}")
@@ -51,25 +67,28 @@ def folder_creator():
 
     return {
         'base_folder': create_folder.base_folder,
-        'reddit_folder': create_folder.reddit_folder_path,
-        'render_folder': create_folder.render_folder_path,
-        'final_folder': create_folder.final_folder_path
+        'jobs_folder': create_folder.jobs_folder_path
     }
 
 
-def get_video_info(directory):
+def get_video_info(directory, reddit=None):
     """
     Fetches video information from Reddit.
 
     Args:
         directory (str): The directory where video information is stored.
+        reddit (Reddit.GetRedditLink): A Reddit reader to reuse, so its clients stay logged in.
 
     Returns:
         list: A list of dictionaries containing video information such as URL and title.
+            In incremental polling mode, a generator that yields them as they are fetched.
     """
     subreddit = config.subreddit
-    info = Reddit.GetRedditLink(subreddit, directory=directory)
+    info = reddit or Reddit.GetRedditLink(subreddit, directory=directory)
     debug_print(f"Fetching video info from Reddit for subreddit: {subreddit}, directory: {directory}")
+    if config.polling.get('mode') == 'incremental':
+        print("Streaming new posts from Reddit.")
+        return info.stream()
     fetched_info = info.main()
     print("Fetched video information from Reddit.")
     debug_print(f"Fetched video info: {fetched_info}")
@@ -85,21 +104,22 @@ def download_video(directory, info):
         info (list): A list of dictionaries containing video information.
 
     Returns:
-        bool: True if at least one video is successfully downloaded, False otherwise.
+        str or None: The path to the first video that is successfully downloaded, None if none is.
     """
     for item in info:
         url = item['url']
         debug_print(f"Attempting to download video from URL: {url}")
         print(f"Attempting to download video: {item['title']}")
-        download = Reddit.DownloadRedditVideo(url=url, directory=directory)
-        if download.download():
-            debug_print(f"Video downloaded successfully: {download}")
+        download = Reddit.DownloadRedditVideo(url=url, directory=directory, duration=item.get('duration'))
+        video_path = download.download()
+        if video_path:
+            debug_print(f"Video downloaded successfully: {video_path}")
             print(f"Video downloaded from URL: {url}")
-            return True
-    return False
+            return video_path
+    return None
 
 
-def render_video(directory, clip_name, output_name, resolution):
+def render_video(directory, clip_name, output_name, resolution, size=None):
     """
     Renders the video to the specified resolution.
 
@@ -108,11 +128,13 @@ def render_video(directory, clip_name, output_name, resolution):
         clip_name (str): The name of the input clip.
         output_name (str): The name of the output clip.
         resolution (tuple): The desired resolution for the output video.
+        size (tuple): The (width, height) of the input clip if known from the post metadata.
 
     Returns:
         str or None: The path to the rendered video if successful, None otherwise.
     """
-    render = EditVideo.Render(directory=directory, clip_name=clip_name, output_name=output_name, resolution=resolution)
+    render = EditVideo.Render(directory=directory, clip_name=clip_name, output_name=output_name, resolution=resolution,
+                              size=size)
     debug_print(f"Rendering video: {render}")
     if render.render:
         debug_print(f"Rendered video successfully: {render}")
@@ -131,6 +153,9 @@ def upload_video(clip_name, title):
 
     Returns:
         bool: True if the upload is successful, False otherwise.
+
+    Raises:
+        Upload.QuotaExceededError: If the YouTube quota is used up.
     """
     description = (
         "#shorts, #funny, #reddit, #redditfunny, #redditvideos, #funnyvideos, "
@@ -162,99 +187,391 @@ def upload_video(clip_name, title):
     return False
 
 
-def day_complete(reason):
+def download_stage(job, jobs_directory):
     """
-    Handles the completion of a day's worth of uploads.
+    Pipeline stage that downloads a post's video into its own job workspace.
 
     Args:
-        reason (str): The reason for completion ('API' or 'count').
+        job (dict): The post information, as returned by get_video_info.
+        jobs_directory (str): The folder holding one workspace per job.
+
+    Returns:
+        dict or None: The job with its workspace set, or None if it should be skipped.
+    """
+    url = job['url']
+    title = job['title']
+    workspace = Folders.JobWorkspace(jobs_directory, url)
+    if job.get('stage') in (Database.DOWNLOADED, Database.RENDERED) and (
+            os.path.exists(workspace.render_input) or os.path.exists(workspace.final_path)):
+        print(f"Reusing the download of an earlier run: {title}")
+        job['workspace'] = workspace
+        return job
+    workspace.create()
+    print(f"Attempting to download video: {title}")
+    video_path = download_video(directory=workspace.download_folder, info=[job])
+    if not video_path:
+        print(f"Failed to download video: {title}")
+        workspace.cleanup()
+        return None
+    os.replace(video_path, workspace.render_input)  # Same folder tree, so this is a rename, not a copy
+    Metrics.metrics().add_bytes('download', os.path.getsize(workspace.render_input))
+    if not check_near_duplicate(job, workspace.render_input):
+        workspace.cleanup()
+        return None
+    job['workspace'] = workspace
+    return job
+
+
+def check_near_duplicate(job, clip_path):
     """
-    hour = 3600
-    day = 86400
+    Hashes a few frames of a downloaded clip and compares them with every uploaded clip, to catch
+    re-uploads of the same video under a new URL before any time is spent rendering it.
+
+    Args:
+        job (dict): The job. Its frame hashes are stored under 'fingerprint'.
+        clip_path (str): The path to the downloaded clip.
 
-    debug_print(f"Day complete reason: {reason}")
-    if reason == 'API':
-        print("Day Complete... Taking a break for 24 hours.")
-        time.sleep(day)
-    elif reason == 'count':
-        print("Upload Count = 6. Trying again in 1 hour...")
-        time.sleep(hour)
+    Returns:
+        bool: False if the clip is a near-duplicate of an uploaded one, True otherwise.
+    """
+    index = Fingerprint.near_duplicate_index()
+    if index is None:
+        return True
+    try:
+        job['fingerprint'] = Fingerprint.fingerprint(clip_path, duration=job.get('duration'),
+                                                     frames=config.fingerprint['frames'])
+    except Exception as e:
+        debug_print(f"Could not fingerprint {clip_path}: {e}")
+        return True
+    duplicate_of = index.find(job['fingerprint'])
+    if duplicate_of is not None:
+        print(f"Near-duplicate of the already uploaded {duplicate_of}. Skipping {job['title']}...")
+        # Remembered like an upload, so later listings do not download and fingerprint it again
+        Database.dedup_store().add(job['url'], reason='near_duplicate')
+        return False
+    return True
 
 
-def video_duration(video_path):
+def render_stage(job, resolution):
     """
-    Gets the duration of a video.
+    Pipeline stage that renders a downloaded video. Runs in a separate process.
+
+    If the same clip was already rendered with the same settings, the cached render is used instead.
 
     Args:
-        video_path (str): The path to the video file.
+        job (dict): The job returned by download_stage.
+        resolution (tuple): The desired resolution for the output video.
 
     Returns:
-        float: The duration of the video in seconds.
+        dict or None: The job with the rendered file set, or None if rendering failed.
+    """
+    workspace = job['workspace']
+    if job.get('stage') == Database.RENDERED and os.path.exists(workspace.final_path):
+        print(f"Reusing the render of an earlier run: {job['title']}")
+        job['rendered_file'] = workspace.final_path
+        return job
+    cache = Cache.render_cache()
+    if cache is not None:
+        cache_key = cache.key(workspace.render_input, resolution)
+        if cache.get(cache_key, workspace.final_path):
+            print(f"Reusing a cached render of the same clip: {job['title']}")
+            job['rendered_file'] = workspace.final_path
+            return job
+    rendered_file = render_video(directory=workspace.path, clip_name=workspace.render_input_name,
+                                 output_name=workspace.render_output_name, resolution=resolution,
+                                 size=(job.get('width'), job.get('height')))
+    if not rendered_file:
+        print(f"Rendering failed for {job['title']}. Skipping uploading.")
+        workspace.cleanup()
+        return None
+    job['rendered_file'] = workspace.commit()
+    if cache is not None:
+        cache.put(cache_key, job['rendered_file'])
+    return job
+
+
+def upload_stage(job, scheduler, stop_event=None):
     """
-    with VideoFileClip(video_path) as clip:
-        duration = clip.duration
-        debug_print(f"Video duration for {video_path}: {duration} seconds")
-        return duration
+    Pipeline stage that uploads a rendered video, records it in the database and removes its workspace.
+
+    Waits for the quota scheduler before every upload. If YouTube still reports the quota as used up,
+    the scheduler is told so and the upload is tried again once the quota resets.
+
+    If stop_event is set while waiting for quota, the job is marked 'stopped' and left as it is:
+    its workspace is kept and it stays rendered in the ledger, so the next start uploads it.
+
+    Args:
+        job (dict): The job returned by render_stage.
+        scheduler (Scheduler.QuotaScheduler): Hands out the YouTube API quota.
+        stop_event (threading.Event): Once set, waiting for quota is given up.
+
+    Returns:
+        dict or None: The job if it was uploaded, None otherwise.
+    """
+    url = job['url']
+    title = job['title']
+    if stop_event is not None and stop_event.is_set():
+        job['stopped'] = True
+        return None
+    try:
+        while True:
+            with Metrics.metrics().timed('quota_wait'):
+                acquired = scheduler.acquire(stop_event=stop_event)
+            if not acquired:
+                print(f"Stopping before uploading {title}. It is uploaded on the next start.")
+                job['stopped'] = True
+                return None
+            try:
+                uploaded = upload_video(clip_name=job['rendered_file'], title=title)
+                break
+            except Upload.QuotaExceededError as e:
+                debug_print(f"Quota error: {e}")
+                print("YouTube quota used up. Waiting for it to reset...")
+                scheduler.exhaust()
+        if uploaded:
+            Metrics.metrics().add_bytes('upload', os.path.getsize(job['rendered_file']))
+    finally:
+        if not job.get('stopped'):
+            job['workspace'].cleanup()
+    if not uploaded:
+        print(f"Upload failed for {title}. Skipping...")
+        return None
+    Database.dedup_store().add(url)
+    index = Fingerprint.near_duplicate_index()
+    if index is not None and job.get('fingerprint'):
+        index.add(url, job['fingerprint'])
+    return job
+
+
+def record_result(stage, job, result, ledger):
+    """
+    Saves the outcome of a pipeline stage in the job ledger.
+
+    Args:
+        stage (str): The name of the stage that finished ('download', 'render' or 'upload').
+        job (dict): The job the stage was given.
+        result (dict or None): The job returned by the stage, or None if the stage dropped it.
+        ledger (Database.JobLedger): The ledger to update.
+    """
+    if result is None:
+        if not job.get('stopped'):  # A stopped job keeps its last stage, so the next start resumes it
+            ledger.forget(job['url'])
+    else:
+        ledger.record(result, STAGE_RECORDS[stage])
+        if stage == 'render':
+            Metrics.metrics().add_bytes('render', os.path.getsize(result['rendered_file']))
+
+
+def build_pipeline(folders, ledger, metrics, stop_event=None):
+    """
+    Builds the download, render and upload pipeline with its quota scheduler.
+
+    Args:
+        folders (dict): The folders returned by folder_creator.
+        ledger (Database.JobLedger): The ledger every finished stage is recorded in.
+        metrics (Metrics.Metrics): Records the time and outcome of every stage.
+        stop_event (threading.Event): Once set, uploads stop waiting for quota.
+
+    Returns:
+        Pipeline.Pipeline: The pipeline.
+    """
+    scheduler = Scheduler.QuotaScheduler(
+        state_file=config.youtube['quota_file'],
+        upload_cost=config.youtube['upload_cost'],
+        daily_quota=config.youtube['daily_quota'],
+        hourly_quota=config.youtube['hourly_quota'],
+        day_length=config.youtube.get('quota_day_seconds')  # Only set by LoadTest.py, to reset the quota quickly
+    )
+    return Pipeline.Pipeline(
+        download=partial(download_stage, jobs_directory=folders['jobs_folder']),
+        render=partial(render_stage, resolution=config.video['dimensions']),
+        upload=partial(upload_stage, scheduler=scheduler, stop_event=stop_event),
+        on_result=partial(record_result, ledger=ledger),
+        metrics=metrics,
+        render_initializer=EditVideo.warm_worker,
+        **config.pipeline
+    )
+
+
+def run_cycle(pipeline, ledger, reddit_directory, reddit=None, stop_event=None):
+    """
+    Processes one listing: the jobs an earlier run did not finish, then the new posts.
+
+    Args:
+        pipeline (Pipeline.Pipeline): The pipeline the jobs are pushed through.
+        ledger (Database.JobLedger): The job ledger.
+        reddit_directory (str): The directory for Reddit downloads.
+        reddit (Reddit.GetRedditLink): A Reddit reader to reuse, or None to log in again.
+        stop_event (threading.Event): Once set, no more jobs are started. Jobs already started are finished.
+    """
+    resumed_jobs = ledger.unfinished()
+    if resumed_jobs:
+        print(f"Resuming {len(resumed_jobs)} unfinished jobs from an earlier run.")
+    video_info = get_video_info(reddit_directory, reddit=reddit)
+    if not video_info and not resumed_jobs:
+        print("No video information found.")
+        return
+    new_jobs = (info for info in video_info if ledger.discover(info))
+    jobs = itertools.chain(resumed_jobs, new_jobs)
+    if stop_event is not None:
+        jobs = itertools.takewhile(lambda job: not stop_event.is_set(), jobs)
+    pipeline.run(jobs)
 
 
 def main():
     """
     Main function to manage the entire workflow from creating folders, downloading,
     rendering, and uploading videos.
+
+    Posts go through a pipeline, so one post downloads while another renders and a third uploads.
+    Every post gets its own workspace, which is removed once the post is done. While the upload quota
+    is used up, downloads and renders keep filling the upload backlog.
+
+    Each finished stage is recorded in the job ledger. Jobs that an earlier run did not finish are
+    processed first, reusing the downloads and renders that are still on disk.
+
+    The time, outcome and bytes of every stage are recorded in Metrics. The 'upload' stage includes
+    the time spent waiting for quota, which is also recorded on its own as 'quota_wait'.
     """
     folders = folder_creator()
-    reddit_directory = folders['reddit_folder']
-    video_info = get_video_info(reddit_directory)
-    if not video_info:
-        print("No video information found.")
-        return
-    render_clip_name = 'render_input.mp4'
-    render_output_name = 'render_output.mp4'
-    render_directory = folders['render_folder']
-    upload_count = 0
-    upload_directory = folders['final_folder']
-    upload_output = 'FINAL_VIDEO.mp4'
-    resolution = config.video['dimensions']
-    for info in video_info:
-        url = info['url']
-        title = info['title']
-        print(f"Attempting to download video: {title}")
-        download_success = download_video(directory=reddit_directory, info=[info])
-        if not download_success:
-            print(f"Failed to download video: {title}")
-            continue
-        video_found = False
-        for file in glob.glob(os.path.join(reddit_directory, '*.mp4')):
-            if os.path.basename(file).startswith(os.path.basename(url)):
-                shutil.copy(file, os.path.join(render_directory, render_clip_name))
-                video_found = True
-                break
-        if not video_found:
-            print(f"No video file found for URL: {url}")
-            continue
-        duration = video_duration(os.path.join(render_directory, render_clip_name))
-        print(f"Downloaded video duration: {duration} seconds")
-        if duration >= 60:
-            print(f"Video too big for a Short. Skipping {title}...")
-            continue
-        rendered_file = render_video(directory=render_directory, clip_name=render_clip_name,
-                                     output_name=render_output_name, resolution=resolution)
-        if rendered_file:
-            shutil.copy(rendered_file, os.path.join(upload_directory, upload_output))
-            if upload_count < 6:
-                if upload_video(clip_name=os.path.join(upload_directory, upload_output), title=title):
-                    upload_count += 1
-                    with open(config.database, 'a') as f:
-                        f.write(f"{url},")
-                else:
-                    day_complete('API')
-            else:
-                day_complete('count')
-        else:
-            print(f"Rendering failed for {title}. Skipping uploading.")
-        print("Taking a break for 10 seconds...")
-        time.sleep(10)
+    metrics = Metrics.metrics()
+    ledger = Database.job_ledger()
+    pipeline = build_pipeline(folders, ledger, metrics)
+    pipeline.open()  # Before the metrics server thread starts
+    if config.metrics.get('prometheus_port'):
+        metrics.serve(config.metrics['prometheus_port'])
+    try:
+        run_cycle(pipeline, ledger, folders['base_folder'])
+    finally:
+        pipeline.close()
+    for stage, summary in metrics.summary().items():
+        debug_print(f"{stage}: {summary['count']} runs, {summary['failures']} failed, "
+                    f"p50 {summary['p50_seconds']:.2f}s, p95 {summary['p95_seconds']:.2f}s, {summary['bytes']} bytes")
+
+
+def write_status(path, status):
+    """
+    Saves the daemon status, replacing the file atomically so a health check never reads half of it.
+
+    Args:
+        path (str): The JSON status file.
+        status (dict): The status to save. Its 'updated' time is set here.
+    """
+    status['updated'] = time.time()
+    Folders.write_json_atomic(path, status)
+
+
+def daemon(interval):
+    """
+    Runs the workflow every interval seconds until SIGTERM or SIGINT.
+
+    The Reddit clients, the YouTube client, the databases and the render processes are created once
+    and reused by every cycle. A status file is rewritten every config.daemon['heartbeat'] seconds,
+    for the --health check. On SIGTERM no new jobs are started and uploads stop waiting for quota;
+    the downloads and renders already started are finished, and anything left is resumed from the
+    job ledger on the next start.
+
+    Args:
+        interval (float): The seconds between the end of one cycle and the start of the next.
+    """
+    stop_event = threading.Event()
+
+    def request_stop(signum, frame):
+        print(f"Received signal {signum}. Finishing the jobs in progress, then stopping...")
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    folders = folder_creator()
+    metrics = Metrics.metrics()
+    ledger = Database.job_ledger()
+    pipeline = build_pipeline(folders, ledger, metrics, stop_event=stop_event)
+    pipeline.open()  # Before any other thread starts, so the render processes fork without a lock held
+    if config.metrics.get('prometheus_port'):
+        metrics.serve(config.metrics['prometheus_port'])
+    reddit = Reddit.GetRedditLink(config.subreddit, directory=folders['base_folder'])
+
+    status_file = config.daemon['status_file']
+    status = {'pid': os.getpid(), 'state': 'starting', 'started': time.time(), 'cycles': 0, 'last_error': None}
+    status_lock = threading.Lock()
+    heartbeat_stopped = threading.Event()
+
+    def set_status(**fields):
+        with status_lock:
+            status.update(fields)
+            write_status(status_file, status)
+
+    def heartbeat():
+        while not heartbeat_stopped.wait(config.daemon['heartbeat']):
+            set_status()
+
+    threading.Thread(target=heartbeat, name='heartbeat', daemon=True).start()
+    print(f"Running as a daemon every {interval:.0f} seconds (pid {os.getpid()}).")
+    try:
+        while not stop_event.is_set():
+            set_status(state='running', cycle_started=time.time())
+            try:
+                run_cycle(pipeline, ledger, folders['base_folder'], reddit=reddit, stop_event=stop_event)
+                set_status(last_error=None)
+            except Exception as e:
+                print(f"Cycle failed: {e}")
+                set_status(last_error=str(e))
+            set_status(state='idle', cycles=status['cycles'] + 1, cycle_finished=time.time())
+            stop_event.wait(interval)
+    finally:
+        set_status(state='stopping')
+        pipeline.close()
+        reddit.close()
+        heartbeat_stopped.set()
+        set_status(state='stopped')
+        print("Daemon stopped.")
+
+
+def check_health(status_file, max_age):
+    """
+    Checks that a daemon is running and its heartbeat is recent.
+
+    Args:
+        status_file (str): The daemon's JSON status file.
+        max_age (float): The oldest heartbeat, in seconds, that still counts as healthy.
+
+    Returns:
+        int: 0 if the daemon is healthy, 1 otherwise. Meant as the process exit code.
+    """
+    try:
+        with open(status_file, 'r') as f:
+            status = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"UNHEALTHY: cannot read {status_file}: {e}")
+        return 1
+    age = time.time() - status.get('updated', 0)
+    summary = (f"state={status.get('state')} pid={status.get('pid')} cycles={status.get('cycles')} "
+               f"heartbeat={age:.0f}s ago")
+    if status.get('state') == 'stopped' or age > max_age:
+        print(f"UNHEALTHY: {summary}")
+        return 1
+    print(f"OK: {summary}" + (f" last_error={status['last_error']}" if status.get('last_error') else ""))
+    return 0
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Turns Reddit videos into YouTube Shorts.")
+    parser.add_argument('--daemon', action='store_true', help="Run headless, processing new posts every interval")
+    parser.add_argument('--interval', type=float, default=config.daemon['interval'],
+                        help="Seconds between two cycles in daemon mode")
+    parser.add_argument('--health', action='store_true',
+                        help="Exit with 0 if a daemon is running and healthy, 1 otherwise")
+    parser.add_argument('--debug', action='store_true', help="Print debug output")
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    start()
+    arguments = parse_arguments()
+    if arguments.health:
+        sys.exit(check_health(config.daemon['status_file'], max_age=3 * config.daemon['heartbeat']))
+    elif arguments.daemon:
+        debug = arguments.debug
+        daemon(arguments.interval)
+    else:
+        start()
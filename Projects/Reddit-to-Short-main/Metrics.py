@@ -0,0 +1,250 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import config
+
+# Upper bounds, in seconds, of the latency histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+
+class Histogram:
+    """Counts observed values per bucket, like a Prometheus histogram."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        """Adds a value to the histogram."""
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, fraction):
+        """
+        Estimates a quantile from the buckets, by interpolating inside the bucket it falls in.
+        The estimate is never above the largest observed value.
+
+        Args:
+            fraction (float): The quantile, e.g. 0.95.
+
+        Returns:
+            float: The estimate, or 0 if nothing was observed.
+        """
+        if self.count == 0:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets, self.counts):
+            if count and seen + count >= target:
+                return min(lower + (bound - lower) * (target - seen) / count, self.max)
+            seen += count
+            lower = bound
+        return self.max
+
+
+class Metrics:
+    """
+    Records how long each stage of the pipeline takes, how often it succeeds and how many bytes it handles.
+
+    Every sample is also appended to a JSONL file if one is set. Renders run in other processes, which
+    write to the same file but have their own counters, so the Prometheus endpoint shows the counters of
+    the main process only.
+    """
+
+    def __init__(self, jsonl_file=None, buckets=DEFAULT_BUCKETS):
+        """
+        Initializes the Metrics.
+
+        Args:
+            jsonl_file (str): The file every sample is appended to, or None.
+            buckets (tuple): The upper bounds of the latency histogram buckets, in seconds.
+        """
+        self.jsonl_file = jsonl_file
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.results = defaultdict(int)
+        self.bytes = defaultdict(int)
+        self.server = None
+
+    def record(self, stage, seconds, success=True):
+        """
+        Records one run of a stage.
+
+        Args:
+            stage (str): The stage, e.g. 'download'.
+            seconds (float): How long it took.
+            success (bool): Whether it succeeded.
+        """
+        with self.lock:
+            if stage not in self.latencies:
+                self.latencies[stage] = Histogram(self.buckets)
+            self.latencies[stage].observe(seconds)
+            self.results[(stage, 'success' if success else 'failure')] += 1
+        self._write({'stage': stage, 'seconds': round(seconds, 4), 'success': success})
+
+    def add_bytes(self, stage, count):
+        """
+        Records the bytes a stage has read or written.
+
+        Args:
+            stage (str): The stage, e.g. 'download'.
+            count (int): The number of bytes.
+        """
+        with self.lock:
+            self.bytes[stage] += count
+        self._write({'stage': stage, 'bytes': count})
+
+    @contextmanager
+    def timed(self, stage):
+        """
+        Times the code in the with block as one run of a stage. It counts as a failure if it raises,
+        or if the block sets sample['success'] to False.
+
+        Args:
+            stage (str): The stage, e.g. 'fetch'.
+
+        Yields:
+            dict: The sample. Set 'success' or 'bytes' on it to record them.
+        """
+        sample = {'success': True, 'bytes': None}
+        start_time = time.perf_counter()
+        try:
+            yield sample
+        except Exception:
+            sample['success'] = False
+            raise
+        finally:
+            self.record(stage, time.perf_counter() - start_time, sample['success'])
+            if sample['bytes'] is not None:
+                self.add_bytes(stage, sample['bytes'])
+
+    def summary(self):
+        """
+        Summarizes every stage.
+
+        Returns:
+            dict: For each stage, its run count, failures, mean, p50, p95 and max latency and bytes.
+        """
+        with self.lock:
+            return {
+                stage: {
+                    'count': histogram.count,
+                    'failures': self.results[(stage, 'failure')],
+                    'mean_seconds': histogram.sum / histogram.count if histogram.count else 0.0,
+                    'p50_seconds': histogram.quantile(0.5),
+                    'p95_seconds': histogram.quantile(0.95),
+                    'max_seconds': histogram.max,
+                    'bytes': self.bytes.get(stage, 0)
+                }
+                for stage, histogram in self.latencies.items()
+            }
+
+    def prometheus_text(self):
+        """
+        Renders the counters in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics page.
+        """
+        lines = [
+            '# HELP reddit_short_stage_seconds Time spent per pipeline stage run.',
+            '# TYPE reddit_short_stage_seconds histogram'
+        ]
+        with self.lock:
+            for stage, histogram in sorted(self.latencies.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'reddit_short_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'reddit_short_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'reddit_short_stage_seconds_sum{{stage="{stage}"}} {histogram.sum}')
+                lines.append(f'reddit_short_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+            lines += [
+                '# HELP reddit_short_stage_runs_total Pipeline stage runs by outcome.',
+                '# TYPE reddit_short_stage_runs_total counter'
+            ]
+            for (stage, outcome), count in sorted(self.results.items()):
+                lines.append(f'reddit_short_stage_runs_total{{stage="{stage}",outcome="{outcome}"}} {count}')
+            lines += [
+                '# HELP reddit_short_stage_bytes_total Bytes handled per pipeline stage.',
+                '# TYPE reddit_short_stage_bytes_total counter'
+            ]
+            for stage, count in sorted(self.bytes.items()):
+                lines.append(f'reddit_short_stage_bytes_total{{stage="{stage}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port, host='127.0.0.1'):
+        """
+        Serves the Prometheus page at http://host:port/metrics from a background thread.
+
+        Args:
+            port (int): The port to listen on.
+            host (str): The address to listen on.
+        """
+        if self.server is not None:
+            return
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip('/') not in ('', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, name='metrics-server', daemon=True).start()
+        logging.info(f"Serving metrics at http://{host}:{port}/metrics")
+
+    def _write(self, sample):
+        if self.jsonl_file is None:
+            return
+        sample = {'time': round(time.time(), 3), 'pid': os.getpid(), **sample}
+        try:
+            with self.lock:
+                with open(self.jsonl_file, 'a') as f:
+                    f.write(json.dumps(sample) + '\n')
+        except OSError as e:
+            logging.warning(f"Could not write metrics to {self.jsonl_file}: {e}")
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def metrics():
+    """
+    Returns the Metrics of this process, configured from config.metrics.
+
+    Returns:
+        Metrics: The shared metrics.
+    """
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = Metrics(jsonl_file=config.metrics.get('jsonl_file'))
+        return _metrics
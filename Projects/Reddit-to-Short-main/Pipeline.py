@@ -0,0 +1,177 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
+# Marks the end of the job stream. Each stage passes it on once all of its workers are done.
+_DONE = object()
+
+
+class Stage:
+    """A pool of worker threads that pulls jobs from an inbox, processes them and pushes results to an outbox."""
+
+    def __init__(self, name, func, workers, inbox, outbox=None, executor=None, on_result=None, metrics=None):
+        """
+        Initializes the Stage with its work function and queues.
+
+        Args:
+            name (str): The name of the stage, used in log messages.
+            func (callable): Takes a job dict and returns the job for the next stage, or None to drop it.
+            workers (int): The number of jobs this stage works on at the same time.
+            inbox (queue.Queue): The queue jobs are taken from.
+            outbox (queue.Queue): The queue finished jobs are put on, or None for the last stage.
+            executor (concurrent.futures.Executor): Runs func somewhere else (e.g. a process pool) if set.
+            on_result (callable): Called in this process as on_result(stage name, job, result) after every job.
+            metrics (Metrics.Metrics): Records the time and outcome of every job under the stage name, if set.
+        """
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.inbox = inbox
+        self.outbox = outbox
+        self.executor = executor
+        self.on_result = on_result
+        self.metrics = metrics
+        self.threads = []
+
+    def start(self):
+        """Starts the worker threads of the stage."""
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"{self.name}-{index}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def join(self):
+        """Waits for every worker to finish and tells the next stage that no more jobs are coming."""
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        if self.outbox is not None:
+            self.outbox.put(_DONE)
+
+    def _work(self):
+        while True:
+            job = self.inbox.get()
+            if job is _DONE:
+                self.inbox.put(_DONE)  # Let the other workers of this stage see it too
+                return
+            start_time = time.perf_counter()
+            try:
+                if self.executor is not None:
+                    result = self.executor.submit(self.func, job).result()
+                else:
+                    result = self.func(job)
+            except Exception as e:
+                logging.error(f"{self.name} stage failed: {e}")
+                result = None
+            if self.metrics is not None:
+                self.metrics.record(self.name, time.perf_counter() - start_time, success=result is not None)
+            if self.on_result is not None:
+                try:
+                    self.on_result(self.name, job, result)
+                except Exception as e:
+                    logging.error(f"{self.name} stage result handler failed: {e}")
+            if result is not None and self.outbox is not None:
+                self.outbox.put(result)
+
+
+class Pipeline:
+    """Runs jobs through download, render and upload stages so that the stages overlap."""
+
+    def __init__(self, download, render, upload, download_workers=2, render_workers=1, upload_workers=1,
+                 queue_size=4, backlog_size=None, on_result=None, metrics=None, render_initializer=None):
+        """
+        Initializes the Pipeline with one function per stage.
+
+        Downloads and uploads are network bound and run on threads. Renders are CPU bound and run in a
+        process pool, so the render function must be a module level function that can be pickled.
+
+        Args:
+            download (callable): The download stage function.
+            render (callable): The render stage function.
+            upload (callable): The upload stage function.
+            download_workers (int): The number of downloads running at the same time.
+            render_workers (int): The number of render processes. None for a quarter of the CPU cores, since
+                every encode already uses several cores.
+            upload_workers (int): The number of uploads running at the same time.
+            queue_size (int): The maximum number of jobs waiting between two stages.
+            backlog_size (int): The maximum number of rendered jobs waiting for upload. Defaults to queue_size.
+            on_result (callable): Called as on_result(stage name, job, result) after every job of every stage.
+                result is None if the stage dropped the job.
+            metrics (Metrics.Metrics): Records the time and outcome of every job of every stage, if set.
+            render_initializer (callable): Run once in every render process before its first job.
+        """
+        self.download = download
+        self.render = render
+        self.upload = upload
+        self.download_workers = download_workers
+        self.render_workers = render_workers or max(1, (os.cpu_count() or 1) // 4)
+        self.upload_workers = upload_workers
+        self.queue_size = queue_size
+        self.backlog_size = backlog_size or queue_size
+        self.on_result = on_result
+        self.metrics = metrics
+        self.render_initializer = render_initializer
+        self.render_pool = None
+
+    def open(self):
+        """
+        Starts the render processes, so they are kept warm across runs until close is called.
+        Call it before starting other threads, e.g. the metrics server, so no lock is held when they fork.
+        """
+        if self.render_pool is None:
+            self.render_pool = self._start_pool()
+
+    def _start_pool(self):
+        pool = ProcessPoolExecutor(max_workers=self.render_workers, initializer=self.render_initializer)
+        # With fork, the first job starts every worker, so they are forked here, before the stage threads
+        # exist, and not later by a stage thread while another thread holds a lock (Metrics, sqlite)
+        pool.submit(int).result()
+        return pool
+
+    def close(self):
+        """Stops the render processes started by open, after their current renders."""
+        if self.render_pool is not None:
+            self.render_pool.shutdown()
+            self.render_pool = None
+
+    def run(self, jobs):
+        """
+        Pushes every job through the stages and waits until the last one is uploaded or dropped.
+        Uses the render processes started by open, or starts them for this run only.
+
+        Args:
+            jobs (iterable): The jobs to process, as dictionaries.
+        """
+        download_queue = queue.Queue(maxsize=self.queue_size)
+        render_queue = queue.Queue(maxsize=self.queue_size)
+        upload_queue = queue.Queue(maxsize=self.backlog_size)
+
+        if self.render_pool is not None:
+            pool = nullcontext(self.render_pool)
+        else:
+            pool = self._start_pool()
+        with pool as render_pool:
+            stages = [
+                Stage('download', self.download, self.download_workers, download_queue, render_queue,
+                      on_result=self.on_result, metrics=self.metrics),
+                Stage('render', self.render, self.render_workers, render_queue, upload_queue, executor=render_pool,
+                      on_result=self.on_result, metrics=self.metrics),
+                Stage('upload', self.upload, self.upload_workers, upload_queue,
+                      on_result=self.on_result, metrics=self.metrics),
+            ]
+            for stage in stages:
+                stage.start()
+
+            try:
+                for job in jobs:
+                    download_queue.put(job)  # Blocks while the download stage is behind
+            finally:
+                # Even if the jobs iterator fails, the jobs already fed are finished and the threads end
+                download_queue.put(_DONE)
+                for stage in stages:
+                    stage.join()
+        logging.debug("Pipeline finished.")
@@ -1,48 +1,104 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import praw
 import redvid
 import config
-import os
+import Database
+import Folders
+import Metrics
 
 DEBUG = config.debug
 
+# The classes that talk to Reddit. Fakes.install replaces them with local stand-ins.
+client_factory = praw.Reddit  # Called with the config.reddit_login credentials, returns a client
+downloader_factory = redvid.Downloader  # Called as downloader_factory(url, max_q=True)
+
 
 def debug_print(message, level="INFO"):
     if DEBUG:
         print(f"[{level}] {message}")
 
 
+def load_cursors(path):
+    """
+    Loads the newest seen post of every subreddit.
+
+    Args:
+        path (str): The JSON file the cursors are saved in.
+
+    Returns:
+        dict: The cursor of each subreddit, by subreddit name.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def save_cursors(path, cursors):
+    """
+    Saves the cursors, replacing the file atomically.
+
+    Args:
+        path (str): The JSON file to save the cursors in.
+        cursors (dict): The cursor of each subreddit, by subreddit name.
+    """
+    Folders.write_json_atomic(path, cursors)
+
+
 class DownloadRedditVideo:
-    def __init__(self, url, directory):
+    def __init__(self, url, directory, duration=None):
         """
         Initializes the DownloadRedditVideo object with the URL and directory.
 
         Args:
             url (str): The URL of the Reddit video to download.
             directory (str): The directory where the video will be saved.
+            duration (float): The duration from the post metadata. If set, redvid's own check is skipped.
         """
         self.url = url
         self.directory = directory
+        self.duration = duration
 
     def download(self):
         """
         Downloads the Reddit video from the specified URL.
 
         Returns:
-            bool: True if the download is successful, False otherwise.
+            str or None: The path to the downloaded file if the download is successful, None otherwise.
         """
         try:
-            download = redvid.Downloader(self.url, max_q=True)
-            if int(download.duration) <= 60:
+            download = downloader_factory(self.url, max_q=True)
+            if self.duration is not None or int(download.duration) <= 60:
                 download.path = self.directory
-                download.download()
-                debug_print(f"Downloaded video of duration: {download.duration} seconds")
-                return True
+                output = download.download()
+                debug_print(f"Downloaded video of duration: {self.duration or download.duration} seconds")
+                if isinstance(output, str) and os.path.isfile(output):
+                    return output
+                return self._newest_video()
             else:
                 debug_print(f"Video too long: {download.duration} seconds. Skipping: {self.url}", "WARNING")
-                return False
+                return None
         except Exception as e:
             debug_print(f"Error downloading video: {e}", "ERROR")
-            return False
+            return None
+
+    def _newest_video(self):
+        """
+        Finds the file redvid wrote, for redvid versions that do not return its path.
+        The directory should only hold this download, so this looks at one or two entries.
+
+        Returns:
+            str or None: The path to the newest .mp4 file in the directory, or None if there is none.
+        """
+        videos = [entry for entry in os.scandir(self.directory) if entry.is_file() and entry.name.endswith('.mp4')]
+        if not videos:
+            return None
+        return max(videos, key=lambda entry: entry.stat().st_mtime).path
 
 
 class GetRedditLink:
@@ -60,6 +116,8 @@ class GetRedditLink:
         self.login = None
         self.posts = []
         self.filtered_output = []
+        self.clients = threading.local()
+        self.executor = None
 
     def log_in(self):
         """
@@ -70,19 +128,41 @@ class GetRedditLink:
         """
         debug_print("Trying to log into Reddit...")
         try:
-            self.login = praw.Reddit(
-                client_id=self.reddit_login['client_id'],
-                client_secret=self.reddit_login['client_secret'],
-                username=self.reddit_login['username'],
-                password=self.reddit_login['password'],
-                user_agent=self.reddit_login['user_agent']
-            )
+            self.login = self.client()
             debug_print("Login successful.")
             return True
         except praw.exceptions.PRAWException as e:
             debug_print(f"Failed to log in: {e}", "ERROR")
             return False
 
+    def new_client(self):
+        """
+        Creates a Reddit client with the configured credentials. praw clients are not thread safe,
+        so every thread that talks to Reddit gets its own.
+
+        Returns:
+            praw.Reddit: The new client.
+        """
+        return client_factory(
+            client_id=self.reddit_login['client_id'],
+            client_secret=self.reddit_login['client_secret'],
+            username=self.reddit_login['username'],
+            password=self.reddit_login['password'],
+            user_agent=self.reddit_login['user_agent']
+        )
+
+    def client(self):
+        """
+        Returns the Reddit client of the calling thread, creating it on first use. Keeping the instance
+        keeps its clients logged in for later calls.
+
+        Returns:
+            praw.Reddit: The client.
+        """
+        if getattr(self.clients, 'reddit', None) is None:
+            self.clients.reddit = self.new_client()
+        return self.clients.reddit
+
     def get_posts(self):
         """
         Fetches the top posts from the specified subreddit.
@@ -91,13 +171,15 @@ class GetRedditLink:
             bool: True if fetching posts is successful, False otherwise.
         """
         debug_print("Fetching top posts...")
-        try:
-            self.posts = list(self.login.subreddit(self.subreddit).top(time_filter="week", limit=99))
-            debug_print(f"Fetched {len(self.posts)} posts.")
-            return True
-        except Exception as e:
-            debug_print(f"Failed to get posts: {e}", "ERROR")
-            return False
+        with Metrics.metrics().timed('fetch') as sample:
+            try:
+                self.posts = list(self.login.subreddit(self.subreddit).top(time_filter="week", limit=config.polling.get('limit', 99)))
+                debug_print(f"Fetched {len(self.posts)} posts.")
+                return True
+            except Exception as e:
+                debug_print(f"Failed to get posts: {e}", "ERROR")
+                sample['success'] = False
+                return False
 
     def filter_posts(self):
         """
@@ -107,38 +189,168 @@ class GetRedditLink:
             bool: True if filtering is successful, False otherwise.
         """
         debug_print("Filtering posts...")
-        try:
-            database_path = config.database
-            if not os.path.exists(database_path):
-                with open(database_path, 'w') as f:
-                    pass
-                debug_print(f"Created database file: {database_path}")
-
-            with open(database_path, 'r') as f:
-                database = f.read().split(',')
-
-            for post in self.posts:
-                author_name = post.author.name if post.author else 'Unknown'
-                if post.stickied or post.over_18 or post.url in database or not post.url.startswith('https://v.redd.it'):
-                    continue
-                self.filtered_output.append({
-                    'url': post.url,
-                    'title': post.title,
-                    'author': author_name
-                })
-            debug_print(f"Filtered {len(self.filtered_output)} posts.")
-            return True
-        except Exception as e:
-            debug_print(f"Error filtering posts: {e}", "ERROR")
-            return False
+        with Metrics.metrics().timed('filter') as sample:
+            try:
+                for post in self.posts:
+                    info = self.filter_post(post)
+                    if info is not None:
+                        self.filtered_output.append(info)
+                debug_print(f"Filtered {len(self.filtered_output)} posts.")
+                return True
+            except Exception as e:
+                debug_print(f"Error filtering posts: {e}", "ERROR")
+                sample['success'] = False
+                return False
+
+    def filter_post(self, post):
+        """
+        Checks whether a single post is a suitable video.
+
+        Args:
+            post (praw.models.Submission): The post to check.
+
+        Returns:
+            dict or None: The post information, or None if the post should be skipped.
+        """
+        author_name = post.author.name if post.author else 'Unknown'
+        if post.stickied or post.over_18 or post.url in Database.dedup_store() or not post.url.startswith('https://v.redd.it'):
+            return None
+        video = self.video_metadata(post)
+        if video is None:
+            debug_print(f"No video metadata. Skipping: {post.url}", "WARNING")
+            return None
+        if video['duration'] >= config.video.get('max_duration', 60):
+            debug_print(f"Video too long: {video['duration']} seconds. Skipping: {post.url}", "WARNING")
+            return None
+        return {
+            'url': post.url,
+            'title': post.title,
+            'author': author_name,
+            'duration': video['duration'],
+            'width': video['width'],
+            'height': video['height']
+        }
+
+    def awaiting_video(self, post):
+        """
+        Checks whether a post is a Reddit video that has no metadata yet because Reddit is still processing it.
+        Such posts are looked at again on later polls, for up to config.polling['metadata_grace'] seconds.
+
+        Args:
+            post (praw.models.Submission): The post to check.
+
+        Returns:
+            bool: True if the post should be looked at again.
+        """
+        grace = config.polling.get('metadata_grace', 3600)
+        return (post.url.startswith('https://v.redd.it') and not post.stickied and not post.over_18
+                and self.video_metadata(post) is None and time.time() - post.created_utc < grace)
+
+    def fetch_new_posts(self, subreddit, cursor):
+        """
+        Fetches the posts of one subreddit that are newer than its cursor. The listing is read newest first
+        and reading stops at the first post that was already seen, so only new posts are requested.
+
+        Args:
+            subreddit (str): The name of a single subreddit.
+            cursor (dict): The 'fullname' and 'created_utc' of the newest post seen last time, or None.
+
+        Returns:
+            list: The new posts, newest first.
+        """
+        limit = config.polling.get('limit', 99)
+        posts = []
+        with Metrics.metrics().timed('fetch'):
+            for post in self.client().subreddit(subreddit).new(limit=limit):
+                if cursor and (post.fullname == cursor['fullname'] or post.created_utc <= cursor['created_utc']):
+                    break
+                posts.append(post)
+        debug_print(f"Fetched {len(posts)} new posts from r/{subreddit}.")
+        return posts
+
+    def stream(self):
+        """
+        Yields suitable posts that appeared since the last call, fetching every subreddit of the
+        '+'-joined list at the same time. Each subreddit's cursor is saved once all its posts were yielded.
+
+        The cursor is not moved past a video that Reddit is still processing (see awaiting_video), so the
+        next poll reads it again. Posts newer than it are read again too; the job ledger skips them.
+
+        Yields:
+            dict: The post information, as in filter_posts.
+        """
+        cursor_file = config.polling.get('cursor_file', 'cursors.json')
+        cursors = load_cursors(cursor_file)
+        subreddits = [name for name in self.subreddit.split('+') if name]
+        if self.executor is None:  # Kept for later calls, so its threads keep their logged in clients
+            self.executor = ThreadPoolExecutor(max_workers=len(subreddits) or 1, thread_name_prefix='reddit')
+        futures = {self.executor.submit(self.fetch_new_posts, name, cursors.get(name)): name for name in subreddits}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                posts = future.result()
+            except Exception as e:
+                debug_print(f"Failed to get posts from r/{name}: {e}", "ERROR")
+                continue
+            filtered = []
+            cursor_index = 0  # The cursor moves to posts[cursor_index], or stays if that is past the end
+            with Metrics.metrics().timed('filter'):
+                for index, post in enumerate(posts):
+                    try:
+                        info = self.filter_post(post)
+                        if info is None and self.awaiting_video(post):
+                            cursor_index = index + 1  # Read this post again on the next poll
+                    except Exception as e:  # One malformed post must not end the listing
+                        debug_print(f"Failed to check post {getattr(post, 'url', '?')}: {e}", "ERROR")
+                        continue
+                    if info is not None:
+                        filtered.append(info)
+            yield from filtered
+            if cursor_index < len(posts):
+                cursor_post = posts[cursor_index]
+                cursors[name] = {'fullname': cursor_post.fullname, 'created_utc': cursor_post.created_utc}
+                save_cursors(cursor_file, cursors)
+
+    def close(self):
+        """Stops the threads that fetch subreddits in incremental mode."""
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    @staticmethod
+    def video_metadata(post):
+        """
+        Reads the duration and size of a post's video from the listing data, without downloading anything.
+
+        Args:
+            post (praw.models.Submission): The post to read.
+
+        Returns:
+            dict or None: The duration in seconds, width and height, or None if the post has no Reddit video.
+        """
+        media = post.secure_media or post.media
+        if not media and getattr(post, 'crosspost_parent_list', None):
+            parent = post.crosspost_parent_list[0]
+            media = parent.get('secure_media') or parent.get('media')
+        reddit_video = (media or {}).get('reddit_video')
+        if not reddit_video or reddit_video.get('duration') is None:
+            return None
+        return {
+            'duration': reddit_video['duration'],
+            'width': reddit_video.get('width'),
+            'height': reddit_video.get('height')
+        }
 
     def main(self):
         """
-        Main method to log in, fetch, and filter posts.
+        Main method to log in, fetch, and filter posts. Can be called again on the same instance
+        to fetch the current listing.
 
         Returns:
             list: A list of dictionaries containing filtered post information.
         """
+        self.posts = []
+        self.filtered_output = []
         if self.log_in():
             if self.get_posts():
                 if self.filter_posts():
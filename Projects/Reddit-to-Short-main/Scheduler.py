@@ -0,0 +1,162 @@
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import Folders
+
+try:
+    from zoneinfo import ZoneInfo
+    QUOTA_TIMEZONE = ZoneInfo('America/Los_Angeles')  # YouTube API quotas reset at midnight Pacific Time
+except Exception:  # No tz database available (e.g. Windows without the tzdata package)
+    QUOTA_TIMEZONE = timezone(timedelta(hours=-8))
+
+
+class QuotaBucket:
+    """A budget of API quota units that is refilled at the start of every day or hour."""
+
+    def __init__(self, name, capacity, period):
+        """
+        Initializes the QuotaBucket.
+
+        Args:
+            name (str): The name of the bucket, used as its key in the state file.
+            capacity (int): The number of units available per period, or None for no limit.
+            period (str or float): 'day', 'hour', or a length in seconds (used by the load test).
+        """
+        self.name = name
+        self.capacity = capacity
+        self.period = period
+        self.window = None
+        self.used = 0
+        self.exhausted = False  # Set when YouTube reported the quota used up, until the next period
+
+    def current_window(self, now):
+        """Returns the key of the period that contains the given time, e.g. '2024-05-01' or '2024-05-01T13'."""
+        if not isinstance(self.period, str):
+            return str(int(now.timestamp() // self.period))
+        local = now.astimezone(QUOTA_TIMEZONE)
+        return local.strftime('%Y-%m-%d') if self.period == 'day' else local.strftime('%Y-%m-%dT%H')
+
+    def next_reset(self, now):
+        """Returns the time at which the bucket is refilled next."""
+        if not isinstance(self.period, str):
+            return datetime.fromtimestamp((now.timestamp() // self.period + 1) * self.period, tz=timezone.utc)
+        local = now.astimezone(QUOTA_TIMEZONE)
+        if self.period == 'day':
+            start = local.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        else:
+            start = local.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        return start
+
+    def refill(self, now):
+        """Empties the used counter if a new period has started."""
+        window = self.current_window(now)
+        if window != self.window:
+            self.window = window
+            self.used = 0
+            self.exhausted = False
+
+    def available(self, now):
+        """Returns the number of units left in the current period."""
+        self.refill(now)
+        if self.exhausted:
+            return 0
+        if self.capacity is None:
+            return float('inf')
+        return self.capacity - self.used
+
+    def spend(self, units, now):
+        """Takes the given units out of the current period's budget."""
+        if self.capacity is not None:
+            self.refill(now)
+            self.used += units
+
+
+class QuotaScheduler:
+    """
+    Lets uploads through only while the YouTube API quota allows it.
+
+    Every call reserves its cost in quota units from a daily and an hourly bucket. When a bucket is empty,
+    acquire blocks until it is refilled. The buckets are saved to a file, so a restart does not forget what
+    was already spent today.
+    """
+
+    def __init__(self, state_file, upload_cost, daily_quota, hourly_quota=None, day_length=None):
+        """
+        Initializes the QuotaScheduler and loads the saved buckets.
+
+        Args:
+            state_file (str): The JSON file the buckets are saved to.
+            upload_cost (int): The quota units one upload costs.
+            daily_quota (int): The quota units available per day.
+            hourly_quota (int): The quota units that may be spent per hour, or None for no hourly limit.
+            day_length (float): Seconds after which the daily quota resets instead of at midnight, for load tests.
+        """
+        self.state_file = state_file
+        self.upload_cost = upload_cost
+        self.buckets = [QuotaBucket('day', daily_quota, day_length or 'day'), QuotaBucket('hour', hourly_quota, 'hour')]
+        self.lock = threading.Lock()
+        self._load()
+
+    def acquire(self, units=None, stop_event=None):
+        """
+        Blocks until the buckets have the given units left, then spends them.
+
+        Args:
+            units (int): The quota units to spend. Defaults to the cost of one upload.
+            stop_event (threading.Event): Once set, the wait ends without spending anything.
+
+        Returns:
+            bool: True if the units were spent, False if stop_event was set first.
+        """
+        units = self.upload_cost if units is None else units
+        while True:
+            with self.lock:
+                now = datetime.now(timezone.utc)
+                empty = [bucket for bucket in self.buckets if bucket.available(now) < units]
+                if not empty:
+                    for bucket in self.buckets:
+                        bucket.spend(units, now)
+                    self._save()
+                    return True
+                resume = max(bucket.next_reset(now) for bucket in empty)
+            wait = max(1.0, (resume - datetime.now(timezone.utc)).total_seconds())
+            print(f"Upload quota used up. Waiting until {resume:%Y-%m-%d %H:%M %Z} ({wait / 3600:.1f} hours)...")
+            if stop_event is None:
+                time.sleep(wait)
+            elif stop_event.wait(wait):
+                return False
+
+    def exhaust(self):
+        """
+        Marks the daily quota as used up until its next reset, e.g. after YouTube reported quotaExceeded.
+        This also holds without a daily cap, so uploads wait for the reset instead of retrying at once.
+        """
+        with self.lock:
+            day = self.buckets[0]
+            day.refill(datetime.now(timezone.utc))
+            day.exhausted = True
+            self._save()
+
+    def _load(self):
+        if not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, 'r') as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Could not read quota state from {self.state_file}: {e}")
+            return
+        for bucket in self.buckets:
+            saved = state.get(bucket.name, {})
+            bucket.window = saved.get('window')
+            bucket.used = saved.get('used', 0)
+            bucket.exhausted = saved.get('exhausted', False)
+
+    def _save(self):
+        state = {bucket.name: {'window': bucket.window, 'used': bucket.used, 'exhausted': bucket.exhausted}
+                 for bucket in self.buckets}
+        Folders.write_json_atomic(self.state_file, state)
@@ -1,5 +1,11 @@
+import http.client
 import httplib2
+import json
 import logging
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
 import config
 from oauth2client.client import flow_from_clientsecrets
 from oauth2client.file import Storage
@@ -10,6 +16,43 @@ from googleapiclient.http import MediaFileUpload
 
 debug = config.debug
 
+# Constants for YouTube API credentials and scope
+CLIENT_SECRETS_FILE = "client_secrets.json"
+STORAGE_FILE = "upload-oauth2.json"
+YOUTUBE_UPLOAD_SCOPE = "https://www.googleapis.com/auth/youtube.upload"
+YOUTUBE_API_SERVICE_NAME = "youtube"
+YOUTUBE_API_VERSION = "v3"
+
+# Credentials are refreshed when they expire within this many seconds
+REFRESH_MARGIN = 300
+
+# Upload errors that are worth retrying after a short wait
+RETRIABLE_STATUS_CODES = (500, 502, 503, 504)
+RETRIABLE_EXCEPTIONS = (httplib2.HttpLib2Error, IOError, http.client.HTTPException)
+RETRIABLE_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded', 'backendError')
+# Upload errors that mean no more uploads will succeed until the quota resets
+QUOTA_REASONS = ('quotaExceeded', 'dailyLimitExceeded', 'uploadLimitExceeded')
+
+
+class QuotaExceededError(Exception):
+    """Raised when YouTube refuses an upload because the API quota or the channel's upload limit is used up."""
+
+
+def error_reason(error):
+    """
+    Reads the reason code (e.g. 'quotaExceeded') from a YouTube API error.
+
+    Args:
+        error (HttpError): The error raised by the API client.
+
+    Returns:
+        str or None: The reason of the first error in the response, or None if there is none.
+    """
+    try:
+        return json.loads(error.content)['error']['errors'][0]['reason']
+    except (ValueError, KeyError, IndexError, TypeError):
+        return None
+
 
 def configure_logging():
     """Configure logging level based on the debug flag."""
@@ -22,7 +65,8 @@ def configure_logging():
 class YouTubeUploader:
     """A class that simplifies uploading videos to YouTube using the YouTube Data API v3."""
 
-    def __init__(self, client_secrets_file, storage_file, scope, api_service_name, api_version):
+    def __init__(self, client_secrets_file, storage_file, scope, api_service_name, api_version,
+                 chunk_size=8 * 1024 * 1024, max_retries=10):
         """
         Initializes the YouTubeUploader object with necessary credentials and API details.
 
@@ -32,6 +76,8 @@ class YouTubeUploader:
             scope (str): The OAuth2 scope for YouTube upload.
             api_service_name (str): The API service name (e.g., "YouTube").
             api_version (str): The API version (e.g., "v3").
+            chunk_size (int): Bytes sent per upload request, a multiple of 256 KiB, or -1 for the whole file.
+            max_retries (int): How many times in a row a failed chunk is retried before giving up.
             debug (bool): Flag to enable or disable debug logging.
         """
         configure_logging()
@@ -40,7 +86,11 @@ class YouTubeUploader:
         self.scope = scope
         self.api_service_name = api_service_name
         self.api_version = api_version
-        self.youtube = self.get_authenticated_service()
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.local = threading.local()  # httplib2.Http is not thread-safe, so each upload thread keeps its own client
+        self.credentials = None
+        self.local.youtube = self.get_authenticated_service()
 
     def get_authenticated_service(self):
         """
@@ -59,45 +109,156 @@ class YouTubeUploader:
             credentials = run_flow(flow, storage)
 
         logging.debug("Authentication successful.")
-        return build(self.api_service_name, self.api_version, http=credentials.authorize(httplib2.Http()))
+        self.credentials = credentials
+        return self.build_service()
+
+    def build_service(self):
+        """
+        Builds a YouTube service object on a new connection pool, authorized with the shared credentials.
+
+        Returns:
+            googleapiclient.discovery.Resource: An authorized YouTube API client service object.
+        """
+        # The discovery document ships with google-api-python-client, so it is read from disk instead of fetched
+        return build(self.api_service_name, self.api_version, http=self.credentials.authorize(httplib2.Http()),
+                     static_discovery=True, cache_discovery=False)
+
+    @property
+    def youtube(self):
+        """The YouTube service object of the calling thread, built on its first upload and reused after."""
+        youtube = getattr(self.local, 'youtube', None)
+        if youtube is None:
+            youtube = self.local.youtube = self.build_service()
+        return youtube
+
+    def refresh_credentials(self):
+        """
+        Refreshes the access token if it has expired or is about to. The new token is saved to the storage file.
+        """
+        expiry = self.credentials.token_expiry
+        # oauth2client keeps token_expiry as a naive UTC datetime
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        expiring = expiry is not None and expiry - now < timedelta(seconds=REFRESH_MARGIN)
+        if self.credentials.access_token_expired or expiring:
+            logging.debug("Access token is about to expire. Refreshing it.")
+            self.credentials.refresh(httplib2.Http())
 
-    def upload(self, file, metadata):
+    def upload(self, file, metadata, progress_callback=None):
         """
         Uploads a video file to YouTube with the provided metadata.
 
+        The file is sent in chunks through a resumable upload session. A chunk that fails with a server
+        error or a network error is retried after a jittered exponential backoff, and the upload resumes
+        where it stopped.
+
         Args:
             file (str): The path to the video file to upload.
             metadata (dict): A dictionary containing metadata for the video (title, description, tags, category, status).
+            progress_callback (callable): Called with the uploaded fraction (0 to 1) after every chunk.
 
         Returns:
             dict: The response from the YouTube API if the upload is successful, None otherwise.
+
+        Raises:
+            QuotaExceededError: If the API quota or upload limit is used up.
         """
-        try:
-            logging.debug(f"Preparing to upload file: {file} with metadata: {metadata}")
-            insert_request = self.youtube.videos().insert(
-                part="snippet,status",
-                body={
-                    "snippet": {
-                        "title": metadata["title"],
-                        "description": metadata["description"],
-                        "tags": metadata["tags"],
-                        "categoryId": metadata["category"]
-                    },
-                    "status": {
-                        "privacyStatus": metadata["status"]
-                    }
+        logging.debug(f"Preparing to upload file: {file} with metadata: {metadata}")
+        insert_request = self.youtube.videos().insert(
+            part="snippet,status",
+            body={
+                "snippet": {
+                    "title": metadata["title"],
+                    "description": metadata["description"],
+                    "tags": metadata["tags"],
+                    "categoryId": metadata["category"]
                 },
-                media_body=MediaFileUpload(file)
+                "status": {
+                    "privacyStatus": metadata["status"]
+                }
+            },
+            media_body=MediaFileUpload(file, chunksize=self.chunk_size, resumable=True)
+        )
+
+        response = None
+        retry = 0
+        while response is None:
+            error = None
+            try:
+                status, response = insert_request.next_chunk()
+                if status is not None:
+                    logging.debug(f"Uploaded {status.progress():.0%} of {file}")
+                    if progress_callback is not None:
+                        progress_callback(status.progress())
+                retry = 0
+            except HttpError as e:
+                reason = error_reason(e)
+                if reason in QUOTA_REASONS:
+                    raise QuotaExceededError(reason) from e
+                if e.resp.status not in RETRIABLE_STATUS_CODES and reason not in RETRIABLE_REASONS:
+                    logging.error(f"Upload failed with HTTP {e.resp.status} ({reason}): {e}")
+                    return None
+                error = f"HTTP {e.resp.status} ({reason})"
+            except RETRIABLE_EXCEPTIONS as e:
+                error = f"{type(e).__name__}: {e}"
+
+            if error is not None:
+                retry += 1
+                if retry > self.max_retries:
+                    logging.error(f"Upload failed after {self.max_retries} retries. Last error: {error}")
+                    return None
+                delay = random.uniform(0, min(64, 2 ** retry))
+                logging.warning(f"Retriable upload error: {error}. Retrying in {delay:.1f} seconds...")
+                time.sleep(delay)
+
+        if progress_callback is not None:
+            progress_callback(1.0)
+        video_id = response.get("id")
+        logging.info(f"Video uploaded successfully! Video ID: {video_id}")
+        return response
+
+
+_uploader = None
+_uploader_lock = threading.Lock()
+
+
+def get_uploader():
+    """
+    Returns the shared YouTubeUploader, authenticating on first use only.
+
+    Returns:
+        YouTubeUploader: The uploader with fresh credentials.
+    """
+    global _uploader
+    with _uploader_lock:
+        if _uploader is None:
+            logging.debug("Initializing YouTubeUploader.")
+            _uploader = YouTubeUploader(
+                client_secrets_file=CLIENT_SECRETS_FILE,
+                storage_file=STORAGE_FILE,
+                scope=YOUTUBE_UPLOAD_SCOPE,
+                api_service_name=YOUTUBE_API_SERVICE_NAME,
+                api_version=YOUTUBE_API_VERSION,
+                chunk_size=config.youtube.get('chunk_size', 8 * 1024 * 1024),
+                max_retries=config.youtube.get('max_retries', 10),
             )
-            response = insert_request.execute()
-            video_id = response.get("id")
-            logging.info(f"Video uploaded successfully! Video ID: {video_id}")
-            return response
-        except HttpError as e:
-            return None
+        else:
+            _uploader.refresh_credentials()
+        return _uploader
 
 
-def start(clip_name, title, description, tags, category, status):
+def set_uploader(uploader):
+    """
+    Replaces the shared uploader, e.g. with a Fakes.FakeUploader for tests.
+
+    Args:
+        uploader: Any object with the refresh_credentials and upload methods of YouTubeUploader.
+    """
+    global _uploader
+    with _uploader_lock:
+        _uploader = uploader
+
+
+def start(clip_name, title, description, tags, category, status, progress_callback=None):
     """
     Starts the video upload process to YouTube.
 
@@ -108,28 +269,17 @@ def start(clip_name, title, description, tags, category, status):
         tags (list): A list of tags for the video.
         category (str): The category ID for the video.
         status (str): The privacy status of the video (e.g., "public", "private").
+        progress_callback (callable): Called with the uploaded fraction (0 to 1) after every chunk.
         debug (bool): Flag to enable or disable debug logging.
 
     Returns:
         dict: The response from the YouTube API if the upload is successful, None otherwise.
+
+    Raises:
+        QuotaExceededError: If the API quota or upload limit is used up.
     """
     configure_logging()
-
-    # Constants for YouTube API credentials and scope
-    CLIENT_SECRETS_FILE = "client_secrets.json"
-    STORAGE_FILE = "upload-oauth2.json"
-    YOUTUBE_UPLOAD_SCOPE = "https://www.googleapis.com/auth/youtube.upload"
-    YOUTUBE_API_SERVICE_NAME = "youtube"
-    YOUTUBE_API_VERSION = "v3"
-
-    logging.debug("Initializing YouTubeUploader.")
-    uploader = YouTubeUploader(
-        client_secrets_file=CLIENT_SECRETS_FILE,
-        storage_file=STORAGE_FILE,
-        scope=YOUTUBE_UPLOAD_SCOPE,
-        api_service_name=YOUTUBE_API_SERVICE_NAME,
-        api_version=YOUTUBE_API_VERSION,
-    )
+    uploader = get_uploader()
 
     metadata = {
         "title": title,
@@ -140,7 +290,7 @@ def start(clip_name, title, description, tags, category, status):
     }
 
     logging.debug(f"Starting upload process for {clip_name}.")
-    response = uploader.upload(clip_name, metadata)
+    response = uploader.upload(clip_name, metadata, progress_callback=progress_callback)
     return response
 
 
@@ -3,8 +3,18 @@ subreddit = "funny" # Subreddit to get the Video from.
 # You can combine multiple subreddits with '+'.
 # Example: "funny+cars"
 
-# Local text database file that ensures no duplicate videos get processed.
-database = 'database.txt'
+# How posts are fetched from Reddit
+polling = {
+    'mode': 'top',  # {top, incremental}. top: this week's top posts. incremental: only posts that are new since the last run.
+    'limit': 99,  # Maximum posts read per subreddit and run
+    'cursor_file': 'cursors.json',  # Remembers the newest post seen in each subreddit (incremental mode)
+    'metadata_grace': 3600  # Seconds a new video post without metadata (still processing) is looked at again
+}
+
+# Local SQLite database file that ensures no duplicate videos get processed.
+database = 'database.sqlite3'
+# Old comma-separated text database. Its URLs are moved into the SQLite database on the first run.
+legacy_database = 'database.txt'
 
 # Reddit login credentials
 reddit_login = {
@@ -19,11 +29,59 @@ reddit_login = {
 youtube = {
     'tags': ['funny', 'shorts', 'lol'], # Can add more tags just like these
     'category': 23,  # Category ID. More about categories below.
-    'status': 'public'  # {public, private, unlisted}
+    'status': 'public',  # {public, private, unlisted}
+    'chunk_size': 8 * 1024 * 1024,  # Bytes per upload request. Must be a multiple of 256 KiB, or -1 for the whole file.
+    'max_retries': 10,  # Retries of a failed chunk (server or network error) before the upload is given up
+    'upload_cost': 1600,  # YouTube API quota units one upload costs
+    'daily_quota': 10000,  # Quota units per day. Resets at midnight Pacific Time.
+    'hourly_quota': None,  # Quota units that may be spent per hour, or None to spend the daily quota as fast as possible
+    'quota_file': 'quota.json'  # Remembers the quota spent so far across restarts
 }
 
 # Video settings
 video = {
     'dimensions': (1080, 1920),  # (horizontal, vertical) or None to upload the original clip as is.
-    'blur': False  # Blur non-perfect-fit clips
+    'blur': False,  # Blur non-perfect-fit clips
+    'max_duration': 60,  # Posts this long or longer (in seconds) are skipped before downloading
+    'backend': 'ffmpeg',  # {ffmpeg, stream, moviepy}. ffmpeg renders in one process and is much faster. stream composites frame by frame in constant memory.
+    'preset': 'medium',  # x264 preset used by the ffmpeg and stream backends {ultrafast, veryfast, fast, medium, slow}
+    'crf': 23  # x264 quality used by the ffmpeg and stream backends. Lower is better quality and bigger files.
+}
+
+# Render cache. The same clip rendered with the same video settings is only rendered once.
+cache = {
+    'enabled': True,
+    'directory': 'output/render_cache',
+    'max_bytes': 5 * 1024 ** 3  # Least recently used renders are deleted once the cache is bigger than this
+}
+
+# Near-duplicate detection. Catches the same video uploaded again under a new URL, before it is rendered.
+fingerprint = {
+    'enabled': True,
+    'frames': 5,  # Frames sampled from each clip
+    'max_distance': 10,  # Frames whose 64-bit hashes differ in at most this many bits count as the same
+    'min_matches': 3  # Clips with at least this many matching frames are near-duplicates
+}
+
+# Pipeline settings. Posts are downloaded, rendered and uploaded at the same time.
+pipeline = {
+    'download_workers': 2,  # Downloads running at the same time
+    'render_workers': None,  # Render processes, or None for a quarter of the CPU cores. Rendering is CPU heavy and
+                             # every ffmpeg encode already uses all cores, so keep this well below your core count.
+    'upload_workers': 1,  # Uploads running at the same time
+    'queue_size': 4,  # Maximum number of posts waiting between two steps
+    'backlog_size': 20  # Maximum number of rendered posts waiting for upload quota
+}
+
+# Metrics. Every stage's timings, outcomes and bytes are appended to jsonl_file and can be scraped by Prometheus.
+metrics = {
+    'jsonl_file': 'output/metrics.jsonl',  # Set to None to turn off the JSONL log
+    'prometheus_port': None  # Port to serve http://127.0.0.1:<port>/metrics on, or None to turn it off
+}
+
+# Daemon mode (python Main.py --daemon). Clients and render processes stay warm between cycles.
+daemon = {
+    'interval': 900,  # Seconds between the end of one cycle and the start of the next
+    'heartbeat': 30,  # Seconds between two writes of the status file. --health fails after three missed ones.
+    'status_file': 'status.json'  # Where the daemon writes its state, for --health
 }
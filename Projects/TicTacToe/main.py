@@ -196,4 +196,5 @@ def main():
     print("--------------------")
     print("Match Tied = "+str(match_tie))
 
-main()
+if __name__ == "__main__":
+    main()
@@ -1,57 +1,249 @@
 import os
+import re
+import sys
+import time
+import json
+import signal
+import socket
+import hashlib
+import argparse
+import traceback
+import importlib
 import importlib.util
 import subprocess
 
 # Set the path to the "Projects" folder
-projects_path = os.path.join(os.getcwd(), "Projects")
-projects = os.listdir(projects_path)
-
-# Display list of projects
-for idx, project in enumerate(projects, start=1):
-    print(f"{idx}: {project}")
-
-# Get user input for project selection
-projectSearch = input("Enter Project Number: ")
-print("\n\n")
-
-# Try to parse the input and check validity
-try:
-    projectIndex = int(projectSearch) - 1
-    if projectIndex < 0 or projectIndex >= len(projects):
-        raise ValueError("Index out of range.")
-except ValueError:
-    print("Not a Valid Input, Try Again...")
-    exit()
-
-# Select the chosen project
-selected_project = os.path.join(projects_path, projects[projectIndex])
-
-# Find the 'main' Python file in the project directory
-found = False
-main_file_path = None
-for root, _, files in os.walk(selected_project):
-    for file in files:
-        if file.endswith(".py") and "main" in file:
-            found = True
-            main_file_path = os.path.join(root, file)
-            break
-    if found:
-        break
+base_path = os.path.dirname(os.path.abspath(__file__))
+projects_path = os.path.join(base_path, "Projects")
+
+# Index of every project, rebuilt only for projects whose folder changed
+registry_path = os.path.join(base_path, ".project_registry.json")
+REGISTRY_VERSION = 1
+
+# Give every project with a requirements.txt its own cached virtualenv instead of installing into this interpreter
+use_project_venvs = False
+venvs_path = os.path.join(base_path, ".venvs")
+
+# The warm launcher (--serve) listens here and keeps these modules imported between runs
+socket_path = os.path.join(base_path, ".launcher.sock")
+PRELOAD_MODULES = ["tkinter", "numpy", "moviepy.editor", "googleapiclient.discovery", "praw"]
+
+# Folders that never hold a project's entry module
+SKIPPED_FOLDERS = {"__pycache__", "venv", ".venv", "env", "node_modules", "output"}
+
+
+def find_entry(project_path):
+    """Returns the project's entry module: main.py if there is one, else the first .py file with "main" in its name."""
+    candidates = []
+    for root, dirs, files in os.walk(project_path):
+        dirs[:] = sorted(d for d in dirs if d not in SKIPPED_FOLDERS and not d.startswith("."))
+        depth = os.path.relpath(root, project_path).count(os.sep) if root != project_path else 0
+        for file in sorted(files, key=str.lower):
+            name = file.lower()
+            if name.endswith(".py") and "main" in name:
+                # Prefer an exact main.py, then the shallowest, then by name
+                candidates.append((name != "main.py", depth, name, os.path.join(root, file)))
+    if not candidates:
+        return None
+    return min(candidates)[3]
+
+
+def file_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def requirements_file(entry_path):
+    # requirements.txt is looked for next to the entry module
+    return os.path.join(os.path.dirname(entry_path), "requirements.txt")
+
+
+def signature(project_path, entry_path):
+    """Changes when files are added to, removed from or renamed in the project folder, or its requirements change."""
+    requirements_path = requirements_file(entry_path) if entry_path else None
+    requirements_mtime = os.stat(requirements_path).st_mtime_ns if requirements_path and os.path.exists(requirements_path) else None
+    return [os.stat(project_path).st_mtime_ns, requirements_mtime]
+
+
+def scan_project(name):
+    project_path = os.path.join(projects_path, name)
+    entry_path = find_entry(project_path)
+    entry = {
+        "signature": signature(project_path, entry_path),
+        "entry": os.path.relpath(entry_path, base_path) if entry_path else None,
+        "module": os.path.splitext(os.path.basename(entry_path))[0] if entry_path else None,
+        "requirements": None,
+        "requirements_hash": None,
+    }
+    if entry_path:
+        requirements_path = requirements_file(entry_path)
+        if os.path.exists(requirements_path):
+            entry["requirements"] = os.path.relpath(requirements_path, base_path)
+            entry["requirements_hash"] = file_hash(requirements_path)
+    return entry
+
+
+def load_registry(rebuild=False):
+    """Returns the registry, rescanning only the projects that are new or whose folder changed."""
+    registry = {"version": REGISTRY_VERSION, "projects_mtime": None, "projects": {}}
+    if not rebuild and os.path.exists(registry_path):
+        try:
+            with open(registry_path) as f:
+                saved = json.load(f)
+            if saved.get("version") == REGISTRY_VERSION:
+                registry = saved
+        except (OSError, ValueError):
+            pass
+
+    changed = False
+    projects_mtime = os.stat(projects_path).st_mtime_ns
+    if registry["projects_mtime"] != projects_mtime:
+        # Projects were added, removed or renamed
+        names = sorted((entry.name for entry in os.scandir(projects_path) if entry.is_dir()), key=str.lower)
+        registry["projects"] = {name: registry["projects"].get(name) for name in names}
+        registry["projects_mtime"] = projects_mtime
+        changed = True
+
+    for name, entry in registry["projects"].items():
+        project_path = os.path.join(projects_path, name)
+        entry_path = os.path.join(base_path, entry["entry"]) if entry and entry["entry"] else None
+        stale = entry is None or entry["signature"] != signature(project_path, entry_path)
+        missing = entry is not None and entry["entry"] and not os.path.exists(os.path.join(base_path, entry["entry"]))
+        if stale or missing:
+            registry["projects"][name] = scan_project(name)
+            changed = True
 
-# If 'main' Python file is found, continue
-if found and main_file_path:
-    module_name = os.path.splitext(os.path.basename(main_file_path))[0]
+    if changed:
+        temporary_path = registry_path + ".tmp"
+        with open(temporary_path, "w") as f:
+            json.dump(registry, f, indent=2)
+        os.replace(temporary_path, registry_path)
+    return registry
 
-    # Check for the existence of 'requirements.txt' in the same folder
-    requirements_path = os.path.join(os.path.dirname(main_file_path), "requirements.txt")
-    if os.path.exists(requirements_path):
-        print(f"Installing requirements from {requirements_path}...")
-        subprocess.run(["pip", "install", "-r", requirements_path])
 
-    # Load the main Python file as a module and execute it
-    spec = importlib.util.spec_from_file_location(module_name, main_file_path)
+REQUIREMENT_PATTERN = re.compile(r"^([A-Za-z0-9][A-Za-z0-9._-]*)\s*(?:\[[^\]]*\])?\s*([^;]*?)\s*(?:;.*)?$")
+VERSION_CHECKS = {
+    "==": lambda installed, wanted: installed == wanted,
+    "!=": lambda installed, wanted: installed != wanted,
+    ">=": lambda installed, wanted: installed >= wanted,
+    "<=": lambda installed, wanted: installed <= wanted,
+    ">": lambda installed, wanted: installed > wanted,
+    "<": lambda installed, wanted: installed < wanted,
+}
+
+
+def version_tuple(version):
+    parts = version.split(".")
+    if not all(part.isdigit() for part in parts):
+        raise ValueError(version)
+    return tuple(int(part) for part in parts) + (0,) * (4 - len(parts))
+
+
+def requirement_satisfied(line):
+    """Checks one requirements.txt line against the installed distributions, without running pip."""
+    from importlib import metadata
+    try:
+        # Imported here, so launching a project without requirements does not pay for it
+        from packaging.requirements import Requirement
+    except ImportError:  # packaging is not installed, so only simple version pins are understood
+        Requirement = None
+    if Requirement is not None:
+        requirement = Requirement(line)
+        if requirement.marker is not None and not requirement.marker.evaluate():
+            return True  # Not needed on this platform
+        try:
+            installed = metadata.version(requirement.name)
+        except metadata.PackageNotFoundError:
+            return False
+        return requirement.specifier.contains(installed, prereleases=True)
+
+    match = REQUIREMENT_PATTERN.match(line)
+    if not match:
+        return False
+    name, specifiers = match.groups()
+    try:
+        installed = metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return False
+    for specifier in filter(None, (part.strip() for part in specifiers.split(","))):
+        operator = next((op for op in (">=", "<=", "==", "!=", ">", "<") if specifier.startswith(op)), None)
+        wanted = specifier[len(operator):].strip() if operator else None
+        if operator is None or wanted.endswith("*"):
+            return False  # ~=, === and wildcards need packaging, so leave them to pip
+        try:
+            if not VERSION_CHECKS[operator](version_tuple(installed), version_tuple(wanted)):
+                return False
+        except ValueError:  # Pre-releases and local versions need packaging too
+            if operator != "==" or installed != wanted:
+                return False
+    return True
+
+
+def missing_requirements(requirements_path):
+    """Returns the requirements.txt lines that the installed distributions do not satisfy."""
+    missing = []
+    with open(requirements_path) as f:
+        for line in f:
+            line = line.split(" #", 1)[0].strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("-") or "://" in line:
+                missing.append(line)  # Options, nested files and URLs are left to pip
+                continue
+            try:
+                if not requirement_satisfied(line):
+                    missing.append(line)
+            except Exception:
+                missing.append(line)
+    return missing
+
+
+def install_requirements(requirements_path, python=sys.executable):
+    """Runs pip with the given interpreter. Returns True if it succeeded."""
+    print(f"Installing requirements from {requirements_path}...")
+    return subprocess.run([python, "-m", "pip", "install", "-r", requirements_path]).returncode == 0
+
+
+def project_venv(name, project):
+    """Returns the Python of the project's own virtualenv, creating it and installing the requirements when they changed."""
+    path = os.path.join(venvs_path, name)
+    python = os.path.join(path, "Scripts", "python.exe") if os.name == "nt" else os.path.join(path, "bin", "python")
+    stamp_path = os.path.join(path, ".requirements.sha256")
+    requirements_path = os.path.join(base_path, project["requirements"])
+    requirements_hash = project["requirements_hash"]  # Up to date, the registry rescans when the file changes
+    if os.path.exists(stamp_path):
+        with open(stamp_path) as f:
+            if f.read().strip() == requirements_hash:
+                return python  # Installed for exactly these requirements before
+    if not os.path.exists(python):
+        import venv
+        print(f"Creating a virtualenv for {name} in {path}...")
+        venv.create(path, with_pip=True)
+    if install_requirements(requirements_path, python=python):
+        with open(stamp_path, "w") as f:
+            f.write(requirements_hash)
+    return python
+
+
+def run_project(project, args):
+    """
+    Imports the project's entry module, reports how long that took, then runs its main function.
+    The working directory is left alone, so relative paths in the arguments mean what they meant to the caller.
+    """
+    main_file_path = os.path.join(base_path, project["entry"])
+    project_dir = os.path.dirname(main_file_path)
+
+    # Let the entry module import the other modules in its folder
+    sys.path.insert(0, project_dir)
+    sys.argv = [main_file_path] + list(args)
+
+    # Load the main Python file as a module, registered so that pickling its functions works
+    start_time = time.perf_counter()
+    spec = importlib.util.spec_from_file_location(project["module"], main_file_path)
     main_module = importlib.util.module_from_spec(spec)
+    sys.modules[project["module"]] = main_module
     spec.loader.exec_module(main_module)
+    print(f"Imported {project['entry']} in {(time.perf_counter() - start_time) * 1000:.0f} ms", file=sys.stderr)
 
     # Check if the 'main' function exists in the module and run it
     if hasattr(main_module, 'main'):
@@ -59,5 +251,326 @@ if found and main_file_path:
         ProjectMain()
     else:
         print("No 'main' function found in the specified file.")
-else:
-    print("No Python file with 'main' in the name was found.")
+
+
+def launch(name, project, args=(), use_venv=True, warm=False):
+    """Installs the project's requirements if needed, then runs it in this process, its virtualenv or the warm launcher."""
+    if project["requirements"] and use_venv and use_project_venvs:
+        python = project_venv(name, project)
+        command = [python, os.path.abspath(__file__), "--project", name, "--no-venv", "--args", *args]
+        return subprocess.run(command).returncode
+
+    # Only call pip when requirements.txt asks for something that is not installed
+    if project["requirements"]:
+        requirements_path = os.path.join(base_path, project["requirements"])
+        missing = missing_requirements(requirements_path)
+        if missing:
+            print(f"Missing or outdated: {', '.join(missing)}")
+            install_requirements(requirements_path)
+
+    if warm:
+        code = launch_warm(name, args)
+        if code is not None:
+            return code
+        print("The warm launcher is not running, starting the project here.", file=sys.stderr)
+    run_project(project, args)
+    return 0
+
+
+def preload():
+    """Imports the heavy modules the projects use, so every forked run starts with them loaded."""
+    for module in PRELOAD_MODULES:
+        start_time = time.perf_counter()
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            print(f"Not preloading {module}: {e}")
+            continue
+        print(f"Preloaded {module} in {(time.perf_counter() - start_time) * 1000:.0f} ms")
+
+
+def serve(path=socket_path):
+    """
+    Runs the warm launcher: imports the heavy modules once, then forks a copy of itself for every launch.
+    The client's stdin, stdout, stderr, environment and working directory are passed over the Unix socket,
+    so the project runs in the client's terminal as if the client had started it. The forked run's pid is
+    sent back first, so the client can forward Ctrl-C to it, then the exit code when the project is done.
+    """
+    if not hasattr(os, "fork") or not hasattr(socket, "send_fds"):
+        print("The warm launcher needs fork and Unix sockets (Linux or macOS, Python 3.9+).")
+        return 1
+    preload()
+    if os.path.exists(path):
+        os.remove(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen()
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)  # Finished runs are reaped automatically
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print(f"Warm launcher listening on {path}")
+    try:
+        while True:
+            connection, _ = server.accept()
+            try:
+                message, fds, _, _ = socket.recv_fds(connection, 1 << 20, 3)
+                request = json.loads(message)
+                project = load_registry()["projects"].get(request["project"])
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Bad request: {e}")
+                connection.close()
+                continue
+            sys.stdout.flush()
+            sys.stderr.flush()
+            pid = os.fork()
+            if pid == 0:
+                server.close()
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.default_int_handler)
+                for target, fd in enumerate(fds):
+                    os.dup2(fd, target)
+                    os.close(fd)
+                if "env" in request:
+                    os.environ.clear()
+                    os.environ.update(request["env"])
+                code = 0
+                try:
+                    if "cwd" in request:
+                        os.chdir(request["cwd"])
+                    if project is None or not project["entry"]:
+                        print(f"Unknown project or no entry module: {request['project']}")
+                        code = 1
+                    else:
+                        run_project(project, request.get("args", []))
+                except SystemExit as e:
+                    code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+                except KeyboardInterrupt:
+                    code = 130
+                except BaseException:
+                    traceback.print_exc()
+                    code = 1
+                sys.stdout.flush()
+                sys.stderr.flush()
+                try:
+                    connection.sendall(json.dumps({"exit": code}).encode() + b"\n")
+                finally:
+                    os._exit(code)
+            for fd in fds:
+                os.close(fd)
+            try:
+                connection.sendall(json.dumps({"pid": pid}).encode() + b"\n")
+            except OSError:
+                pass  # The client is gone; the run notices when it writes to the terminal
+            connection.close()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        server.close()
+        os.remove(path)
+    return 0
+
+
+def launch_warm(name, args, path=socket_path):
+    """
+    Runs the project in the warm launcher. Returns its exit code, or None if the launcher is not running.
+    The forked run is not in this terminal's process group, so Ctrl-C and SIGTERM are forwarded to it.
+    """
+    if not hasattr(socket, "send_fds") or not os.path.exists(path):
+        return None
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(path)
+    except OSError:
+        return None
+    run = {}
+
+    def forward(signum, frame):
+        if "pid" in run:
+            try:
+                os.kill(run["pid"], signum)
+            except ProcessLookupError:
+                pass
+
+    previous = {signum: signal.signal(signum, forward) for signum in (signal.SIGINT, signal.SIGTERM)}
+    try:
+        with client, client.makefile("rb") as replies:
+            request = {"project": name, "args": list(args), "env": dict(os.environ), "cwd": os.getcwd()}
+            socket.send_fds(client, [json.dumps(request).encode()], [0, 1, 2])
+            # The server replies with the run's pid, and the run itself with its exit code when it is done
+            for line in replies:
+                reply = json.loads(line)
+                if "exit" in reply:
+                    return reply["exit"]
+                run["pid"] = reply["pid"]
+        return 1
+    finally:
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
+
+
+# __import__ goes through the import statement's code path, which is what -X importtime reports on
+IMPORT_PROBE = "import os, sys; sys.path.insert(0, os.getcwd()); sys.argv = sys.argv[1:]; __import__(sys.argv[0])"
+
+
+def profile_project(project):
+    """
+    Imports the project's entry module in a fresh interpreter with -X importtime.
+
+    Returns the entry module's total import time and the cumulative time of each module it imports
+    directly, in microseconds, or the error if the import failed.
+    """
+    main_file_path = os.path.join(base_path, project["entry"])
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", IMPORT_PROBE, project["module"]],
+                            cwd=os.path.dirname(main_file_path), stdin=subprocess.DEVNULL,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, timeout=300)
+    # Lines look like "import time:  self [us] | cumulative | imported package", children indented
+    # by two spaces per level and listed before their parent
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        level = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        entries.append((level, name.strip(), int(cumulative)))
+    entry = next((index for index, (level, name, _) in enumerate(entries)
+                  if level == 0 and name == project["module"]), None)
+    if result.returncode != 0 or entry is None:
+        error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f"exit code {result.returncode}"
+        return {"error": error}
+    # The direct imports of the entry module are the level 1 lines just before it
+    imports = {}
+    for level, name, cumulative in reversed(entries[:entry]):
+        if level == 0:
+            break
+        if level == 1:
+            imports[name] = cumulative
+    return {"total_us": entries[entry][2], "imports": imports}
+
+
+def profile_imports(registry, names, top=10, repeat=3, baseline_path=None, compare_path=None):
+    """Prints each project's import time and its slowest direct imports, slowest project first."""
+    profiles = {}
+    for name in names:
+        project = registry["projects"][name]
+        if not project["entry"]:
+            continue
+        runs = [profile_project(project) for _ in range(repeat)]
+        successful = [run for run in runs if "error" not in run]
+        profiles[name] = min(successful, key=lambda run: run["total_us"]) if successful else runs[-1]
+
+    baseline = None
+    if compare_path:
+        with open(compare_path) as f:
+            baseline = json.load(f)["projects"]
+
+    ranked = sorted(profiles.items(), key=lambda item: -item[1].get("total_us", -1))
+    for name, profile in ranked:
+        if "error" in profile:
+            print(f"\n{name}: import failed ({profile['error']})")
+            continue
+        line = f"\n{name}: {profile['total_us'] / 1000:.1f} ms"
+        before = (baseline or {}).get(name, {})
+        if before.get("total_us"):
+            line += f" (baseline {before['total_us'] / 1000:.1f} ms, {profile['total_us'] / before['total_us'] - 1:+.0%})"
+        print(line)
+        slowest = sorted(profile["imports"].items(), key=lambda item: -item[1])[:top]
+        for module, cumulative in slowest:
+            change = ""
+            previous = before.get("imports", {}).get(module)
+            if previous:
+                change = f"  {cumulative / previous - 1:+.0%}"
+            print(f"  {cumulative / 1000:>9.1f} ms  {module}{change}")
+
+    if baseline_path:
+        with open(baseline_path, "w") as f:
+            json.dump({"python": sys.version.split()[0], "projects": profiles}, f, indent=2)
+        print(f"\nBaseline saved to {baseline_path}")
+
+
+def find_project(registry, search):
+    """Finds a project by number, by exact name or by case-insensitive name."""
+    names = list(registry["projects"])
+    if search.isdigit() and 1 <= int(search) <= len(names):
+        return names[int(search) - 1]
+    if search in registry["projects"]:
+        return search
+    return next((name for name in names if name.lower() == search.lower()), None)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Lists and launches the projects in the Projects folder.")
+    parser.add_argument("--project", help="Name or number of the project to launch, instead of the menu")
+    parser.add_argument("--args", nargs=argparse.REMAINDER, default=[],
+                        help="Everything after this is passed to the project as sys.argv")
+    parser.add_argument("--list", action="store_true", help="List the projects and their entry modules")
+    parser.add_argument("--rebuild", action="store_true", help="Rescan every project")
+    parser.add_argument("--warm", action="store_true", help="Run in the warm launcher if it is running")
+    parser.add_argument("--serve", action="store_true", help="Start the warm launcher")
+    parser.add_argument("--no-venv", action="store_true", help="Ignore use_project_venvs")
+    parser.add_argument("--profile-imports", action="store_true",
+                        help="Import every project (or --project) in a fresh interpreter and rank the slowest imports")
+    parser.add_argument("--top", type=int, default=10, help="Imports listed per project by --profile-imports")
+    parser.add_argument("--repeat", type=int, default=3, help="Imports per project; the fastest is kept")
+    parser.add_argument("--save-baseline", metavar="FILE", help="Save the --profile-imports results to FILE")
+    parser.add_argument("--compare", metavar="FILE", help="Compare the --profile-imports results with a saved baseline")
+    return parser.parse_args()
+
+
+def main():
+    arguments = parse_arguments()
+    if arguments.serve:
+        sys.exit(serve())
+    registry = load_registry(rebuild=arguments.rebuild)
+    projects = list(registry["projects"])
+
+    if arguments.profile_imports:
+        names = projects
+        if arguments.project:
+            name = find_project(registry, arguments.project)
+            if name is None:
+                print(f"No project named {arguments.project}.")
+                sys.exit(1)
+            names = [name]
+        profile_imports(registry, names, top=arguments.top, repeat=arguments.repeat,
+                        baseline_path=arguments.save_baseline, compare_path=arguments.compare)
+        return
+
+    if arguments.list:
+        for idx, name in enumerate(projects, start=1):
+            print(f"{idx}: {name} ({registry['projects'][name]['entry'] or 'no entry module'})")
+        return
+
+    if arguments.project:
+        name = find_project(registry, arguments.project)
+        if name is None:
+            print(f"No project named {arguments.project}.")
+            sys.exit(1)
+    else:
+        # Display list of projects
+        for idx, project in enumerate(projects, start=1):
+            print(f"{idx}: {project}")
+
+        # Get user input for project selection
+        projectSearch = input("Enter Project Number: ")
+        print("\n\n")
+
+        # Try to parse the input and check validity
+        try:
+            projectIndex = int(projectSearch) - 1
+            if projectIndex < 0 or projectIndex >= len(projects):
+                raise ValueError("Index out of range.")
+        except ValueError:
+            print("Not a Valid Input, Try Again...")
+            exit()
+        name = projects[projectIndex]
+
+    # Select the chosen project
+    project = registry["projects"][name]
+    if project["entry"]:
+        sys.exit(launch(name, project, arguments.args, use_venv=not arguments.no_venv, warm=arguments.warm))
+    else:
+        print("No Python file with 'main' in the name was found.")
+
+
+if __name__ == "__main__":
+    main()